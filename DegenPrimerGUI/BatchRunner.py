@@ -0,0 +1,238 @@
+# coding=utf-8
+#
+# Copyright (C) 2013 Allis Tauri <allista@gmail.com>
+#
+# DegenPrimerGUI is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# DegenPrimerGUI is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Created on Oct 18, 2026
+
+Qt-free batch runner: executes many analyses in a pool of persistent
+pipeline subprocesses using the same protocol as the GUI.
+
+@author: Allis Tauri <allista@gmail.com>
+'''
+
+import os
+import sys
+import re
+import glob
+from time import time
+from Queue import Queue, Empty
+from threading import Thread, Lock
+from datetime import timedelta
+from multiprocessing import cpu_count
+from DegenPrimer.DegenPrimerConfig import DegenPrimerConfig
+from DegenPrimer.AnalysisTask import AnalysisTask
+from DegenPrimer.OptimizationTask import OptimizationTask
+
+from .SubprocessWorker import SubprocessWorker
+from .TerminalLog import RotatingLog
+
+#the pipeline runs in subprocesses; only the path of its script is needed
+pipeline = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'degen_primer_pipeline.py')
+
+
+class BatchJob(object):
+    '''Analysis of a single configuration file'''
+    def __init__(self, config_file):
+        self.config_file = os.path.abspath(config_file)
+        self.cwd         = os.path.dirname(self.config_file)
+        self.name        = os.path.splitext(os.path.basename(config_file))[0]
+        self.options     = None
+        self.error       = None
+        self.success     = False
+        self.reports     = []
+        self.metrics     = None
+        self.elapsed     = 0
+    #end def
+
+    def load(self):
+        '''Parse the configuration; returns False if there is nothing to run'''
+        #relative paths in a configuration are relative to its directory
+        cwd = os.getcwd()
+        os.chdir(self.cwd)
+        try:
+            config = DegenPrimerConfig()
+            config.parse_configuration(self.config_file)
+            if not (OptimizationTask.check_options(config)
+                    or AnalysisTask.check_options(config)):
+                self.error = 'nothing to do'
+                return False
+            self.name    = config.job_id
+            self.options = config.options
+        except Exception, e:
+            self.error = str(e) or e.__class__.__name__
+            return False
+        finally: os.chdir(cwd)
+        return True
+    #end def
+#end class
+
+
+class BatchWorker(SubprocessWorker):
+    '''Persistent pipeline subprocess running batch jobs one by one.
+    The output of a job is written to its log and, unless quiet,
+    to stdout with each line prefixed by the job name.'''
+
+    _line_start = re.compile(r'(^|\r)(?=[^\r\n])', re.M)
+    _out_lock   = Lock()
+
+    def __init__(self, module, quiet=False):
+        SubprocessWorker.__init__(self, module, persistent=True)
+        self._quiet = quiet
+        self._job   = None
+        self._log   = None
+    #end def
+
+    def _output(self, text):
+        if self._log is not None: self._log.write(text)
+        if self._quiet: return
+        if self._job is not None:
+            prefix = u'[%s] ' % self._job.name
+            text = self._line_start.sub(lambda m: m.group(1)+prefix, text)
+        with self._out_lock:
+            sys.stdout.write(unicode(text).encode('UTF-8'))
+            sys.stdout.flush()
+    #end def
+
+    def _results(self, data): self._job.reports.extend(data)
+
+    def _metrics(self, metrics, filename): self._job.metrics = metrics
+
+    def abort(self):
+        #an idle subprocess does not expect an abort signal
+        if self._job is None: return
+        self._job.error = 'aborted'
+        self.stop()
+    #end def
+
+    def run(self, job):
+        self._job = job
+        try: self._log = RotatingLog(os.path.join(job.cwd, '%s.log' % job.name))
+        except (IOError, OSError), e:
+            job.error = 'unable to open log: %s' % str(e)
+        time0 = time()
+        success = self.run_job(job.options, job.cwd)
+        job.elapsed = time()-time0
+        job.success = success
+        if not job.success and job.error is None:
+            job.error = 'failed'
+        if self._log is not None: self._log.close()
+        self._log = None
+        self._job = None
+    #end def
+#end class
+
+
+class BatchRunner(object):
+    '''Runs batch jobs in up to workers persistent subprocesses at a time'''
+
+    def __init__(self, module, workers=None, quiet=False):
+        self._module  = module
+        self._workers = max(1, workers or cpu_count())
+        self._quiet   = quiet
+        self._queue   = Queue()
+        self._pool    = []
+        self._aborted = False
+        self.jobs     = []
+        self.elapsed  = 0
+    #end def
+
+    @staticmethod
+    def find_configs(paths):
+        '''Configuration files given directly or found in directories'''
+        configs = []
+        for path in paths:
+            if os.path.isdir(path):
+                configs.extend(sorted(glob.glob(os.path.join(path, '*.cfg'))))
+            else: configs.append(path)
+        return configs
+    #end def
+
+    def _serve(self, worker):
+        try:
+            while not self._aborted:
+                try: job = self._queue.get_nowait()
+                except Empty: break
+                worker.run(job)
+        finally: worker.shutdown()
+    #end def
+
+    def abort(self):
+        '''Drop queued jobs and abort the running ones'''
+        self._aborted = True
+        for worker, _thread in self._pool: worker.abort()
+    #end def
+
+    def run(self, config_files):
+        '''Run all configurations; returns the number of failed jobs'''
+        time0 = time()
+        for config_file in config_files:
+            job = BatchJob(config_file)
+            self.jobs.append(job)
+            if job.load(): self._queue.put(job)
+            else: print 'Skipping %s: %s' % (config_file, job.error)
+        workers = min(self._workers, self._queue.qsize())
+        for _i in xrange(workers):
+            worker = BatchWorker(self._module, self._quiet)
+            thread = Thread(target=self._serve, args=(worker,))
+            thread.daemon = True
+            thread.start()
+            self._pool.append((worker, thread))
+        #join with a timeout so that KeyboardInterrupt gets through
+        for _worker, thread in self._pool:
+            while thread.is_alive(): thread.join(0.5)
+        self._pool = []
+        self.elapsed = time()-time0
+        return len(self.failed)
+    #end def
+
+    @property
+    def succeeded(self): return [job for job in self.jobs if job.success]
+
+    @property
+    def failed(self): return [job for job in self.jobs if not job.success]
+
+    def summary(self):
+        lines = ['', 'Batch summary', '-'*72,
+                 '%-30s %10s %10s %10s  %s' % ('Job', 'Wall', 'CPU, s', 'Peak, MB', 'Status')]
+        cpu = 0
+        for job in self.jobs:
+            status = 'done' if job.success else 'FAILED (%s)' % (job.error or 'not run')
+            job_cpu = peak = ''
+            if job.metrics:
+                job_cpu = job.metrics['user_time']+job.metrics['system_time']
+                cpu    += job_cpu
+                job_cpu = '%.1f' % job_cpu
+                peak    = '%.1f' % (job.metrics['peak_tree_rss']/float(1<<20))
+            lines.append('%-30s %10s %10s %10s  %s' % (job.name,
+                                                       timedelta(seconds=int(job.elapsed)),
+                                                       job_cpu, peak, status))
+        lines.append('-'*72)
+        busy = sum(job.elapsed for job in self.jobs)
+        lines.append('Jobs: %d, succeeded: %d, failed: %d'
+                     % (len(self.jobs), len(self.succeeded), len(self.failed)))
+        lines.append('Wall time: %s, job time: %s'
+                     % (timedelta(seconds=int(self.elapsed)),
+                        timedelta(seconds=int(busy))))
+        lines.append('CPU time: %s' % timedelta(seconds=int(cpu)))
+        if self.elapsed > 0:
+            lines.append('Throughput: %.2f jobs/hour, parallel speedup: %.2fx'
+                         % (len(self.succeeded)*3600.0/self.elapsed,
+                            busy/self.elapsed))
+        return '\n'.join(lines)+'\n'
+    #end def
+#end class
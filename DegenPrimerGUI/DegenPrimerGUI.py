@@ -21,23 +21,41 @@ Created on Jul 27, 2012
 
 import os
 import abc
-from PyQt4 import uic
+import threading
+from itertools import islice
+from multiprocessing import cpu_count
 from PyQt4.QtCore import QString, pyqtSlot, pyqtSignal, \
-QSettings, pyqtWrapperType, Qt
+QSettings, pyqtWrapperType, Qt, QTimer, QPoint
 from PyQt4.QtGui import QApplication, QMainWindow, QGroupBox, \
-QFileDialog,  QFont, QMessageBox, QTextDocument, \
+QFileDialog,  QFont, QMessageBox, \
 QLabel, QGridLayout, QTextCursor, QPushButton, \
-QFrame, QTextEdit, QLineEdit, QShortcut, QKeySequence
+QFrame, QTextEdit, QLineEdit, QShortcut, QKeySequence, QSpinBox, QCheckBox, QColor
 
 from DegenPrimer.DegenPrimerConfig import DegenPrimerConfig
 from DegenPrimer.Option import Option, OptionGroup
-from DegenPrimer.AnalysisTask import AnalysisTask
-from DegenPrimer.OptimizationTask import OptimizationTask
 
-from .Widgets import SequenceTableView
-from .SubprocessThread import SubprocessThread
+from .Widgets import SequenceTableView, SequenceFilter, JobQueueView, StageProgressView, ProfileView, \
+TextFileLoader, LargeTextView, ReportSearch
+from .JobQueue import JobQueue
 from .Field import Field
-import degen_primer_pipeline
+from .QtOutput import TerminalBuffer
+from .Telemetry import format_metrics
+from .UiForms import setup_ui
+
+#the pipeline runs in a subprocess; the GUI needs only the path
+_pipeline = os.path.join(os.path.dirname(os.path.abspath(__file__)), 
+                         'degen_primer_pipeline.py')
+
+#modules that are not needed to show the main window
+_deferred_modules = ('DegenPrimer.AnalysisTask', 
+                     'DegenPrimer.OptimizationTask',
+                     'BioUtils.SeqUtils')
+
+def _tasks():
+    from DegenPrimer.AnalysisTask import AnalysisTask
+    from DegenPrimer.OptimizationTask import OptimizationTask
+    return AnalysisTask, OptimizationTask
+#end def
 
 try: import DegenPrimerUI_rc #qt resources for the UI
 except: pass
@@ -74,11 +92,6 @@ class DegenPrimerGUI(DegenPrimerConfig, QMainWindow):
                                          _cwdir_option,
                                          ))
     _skip_options     = []
-
-    #stdout/err catcher signal
-    _append_terminal_output = pyqtSignal(str)
-    #signal to abort computations
-    _pipeline_thread_stop   = pyqtSignal()
     
     
     #constructor
@@ -92,6 +105,12 @@ class DegenPrimerGUI(DegenPrimerConfig, QMainWindow):
         self._settings = QSettings()
         #try to load UI
         self.load_ui(self._ui_file, self)
+        #terminal output is appended in batches
+        self._terminal_buffer = TerminalBuffer(self.terminalOutput, parent=self)
+        self._terminal_buffer.coalesced.connect(self._show_terminal_stats)
+        self._terminal_buffer.following_changed.connect(self._show_terminal_mode)
+        self.terminalOutput.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.terminalOutput.customContextMenuRequested.connect(self._terminal_menu)
         #fields
         Field.customize_field = self._customize_field
         self._fields = dict()
@@ -100,42 +119,78 @@ class DegenPrimerGUI(DegenPrimerConfig, QMainWindow):
         #job-id label
         self._job_id_label = QLabel(self)
         self.configForm.addWidget(self._job_id_label)
+        #report files already shown in tabs, loaded when activated
+        self._shown_reports = set()
+        self.mainTabs.currentChanged.connect(self._load_report_tab)
         #sequence db view
         self._loaded_files = []
         self._seq_db_widget = None
+        self._seq_filter = None
         self._seq_db_box = None
         self._seq_db_button = None
         for group in self._option_groups: self._build_group_gui(group)
         #setup default values
         self._reset_fields()
         #setup buttons
-        self._run_widgets  = (self.abortButton, 
-                              self.elapsedTimeLineEdit,
-                              self.elapsedTimeLabel,)
-        self._idle_widgets = (self.saveButton,
-                              self.runButton,
-                              self.resetButton,
-                              self.reloadButton,)
+        self._run_widgets  = (self.abortButton,)
+        #elapsed time of each job is shown in the job queue
+        self.elapsedTimeLineEdit.hide()
+        self.elapsedTimeLabel.hide()
         self.reloadButton.clicked.connect(self.reload_config)
         self.resetButton.clicked.connect(self._reset_fields)
         self.saveButton.clicked.connect(self._save_config)
         self.runButton.clicked.connect(self._analyse)
         self.abortButton.clicked.connect(self._abort_analysis)
         self._show_run_specific_widgets(False)
-        #setup terminal output
-        self._append_terminal_output.connect(self.terminalOutput.insertPlainText)
-        self.terminalOutput.textChanged.connect(self.terminalOutput.ensureCursorVisible)
-        #pipeline thread
-        self._pipeline_thread = SubprocessThread(degen_primer_pipeline)
-        self._pipeline_thread.started.connect(self.lock_buttons)
-        self._pipeline_thread.results_received.connect(self.register_reports)
-        self._pipeline_thread.finished.connect(self.show_results)
-        self._pipeline_thread.finished.connect(self.unlock_buttons)
-        self._pipeline_thread.update_timer.connect(self.update_timer)
-        self._pipeline_thread.message_received.connect(self.show_message)
-        self._pipeline_thread_stop.connect(self._pipeline_thread.stop)
+        #job queue with a warm worker per parallel job
+        workers = self._settings.value('jobs/workers', defaultValue=cpu_count()).toInt()[0]
+        self._queue = JobQueue(_pipeline, workers, parent=self)
+        self._queue_view = JobQueueView(self)
+        self.terminalSplitter.insertWidget(1, self._queue_view)
+        self._progress_view = StageProgressView(self)
+        self.terminalSplitter.insertWidget(2, self._progress_view)
+        self._queue.job_added.connect(self._queue_view.add_job)
+        self._queue.job_changed.connect(self._queue_view.update_job)
+        self._queue.job_changed.connect(self._follow_job_progress)
+        self._queue_view.job_selected.connect(self._watch_job)
+        self._queue_view.abort_job.connect(self._queue.abort)
+        self._queue.busy_changed.connect(self._show_run_specific_widgets)
+        self._queue.report_ready.connect(self._show_job_report)
+        self._queue.profile_ready.connect(self.show_profile)
+        self._queue.stage_started.connect(self._show_stage_started)
+        self._queue.stage_finished.connect(self._show_stage_finished)
+        self._queue.progress.connect(self._show_progress)
+        self._queue.job_finished.connect(self.show_results)
+        self._queue.message_received.connect(self.show_message)
+        #number of parallel jobs
+        self._workers_spinbox = QSpinBox(self)
+        self._workers_spinbox.setRange(1, max(cpu_count()*4, workers))
+        self._workers_spinbox.setValue(workers)
+        self._workers_spinbox.setPrefix('Parallel jobs: ')
+        self._workers_spinbox.setToolTip('Maximum number of analyses run at the same time')
+        self._workers_spinbox.valueChanged.connect(self._set_workers)
+        self.statusBar().addPermanentWidget(self._workers_spinbox)
+        #profiling of analyses, also enabled by DP_PROFILE
+        self._profile_checkbox = QCheckBox('Profile', self)
+        self._profile_checkbox.setToolTip('Profile the analyses and show where the time goes')
+        self._profile_checkbox.setChecked(bool(os.environ.get('DP_PROFILE', False)))
+        self.statusBar().addPermanentWidget(self._profile_checkbox)
         #restore GUI state
         self._restore_mainwindow_state()
+        #load the rest once the event loop is running
+        QTimer.singleShot(0, self._preload)
+    #end def
+    
+    @pyqtSlot()
+    def _preload(self):
+        '''Import the modules not needed for the first paint in background'''
+        def load():
+            for name in _deferred_modules:
+                try: __import__(name)
+                except Exception: pass #reported when the module is used
+        preloader = threading.Thread(target=load, name='preload')
+        preloader.daemon = True
+        preloader.start()
     #end def
     
     
@@ -176,7 +231,9 @@ class DegenPrimerGUI(DegenPrimerConfig, QMainWindow):
             if self._seq_db_widget.loading:
                 self._seq_db_widget.abort_loading.emit()
             self._seq_db_widget.deleteLater()
+            self._seq_filter.deleteLater()
         self._seq_db_widget = None
+        self._seq_filter = None
         self._seq_db_button.setText('Show Sequence Selector')
     
     def _del_seq_db_if_changed(self):
@@ -193,15 +250,18 @@ class DegenPrimerGUI(DegenPrimerConfig, QMainWindow):
         if self._seq_db_widget is None: return
         if self._seq_db_widget.isHidden():
             self._seq_db_widget.show()
+            self._seq_filter.show()
             self._seq_db_button.setText('Hide Sequence Selector')
         else: 
             self._seq_db_widget.hide()
+            self._seq_filter.hide()
             self._seq_db_button.setText('Show Sequence Selector')
         
         
     @pyqtSlot()
     def _seq_db_loaded(self):
         self._seq_db_widget.set_ids(', '.join(self._fields['use_sequences'].field.text()))
+        self._seq_filter.setVisible(self._seq_db_widget.isVisible())
         self._seq_db_button.setText('Hide Sequence Selector')
     
     def _load_seq_db(self, filenames):
@@ -210,12 +270,17 @@ class DegenPrimerGUI(DegenPrimerConfig, QMainWindow):
         self._seq_db_button.setText('Loading sequences, please wait...')
         self._seq_db_widget = SequenceTableView(self.centralWidget())
         self._seq_db_widget.loaded.connect(self._seq_db_loaded)
-        self._seq_db_widget.load_db(filenames)
+        #relative paths are relative to the working directory of the job
+        self._seq_db_widget.load_db([os.path.join(self._cwdir, f) for f in filenames])
+        self._seq_filter = SequenceFilter(self._seq_db_widget, self.centralWidget())
+        self._seq_filter.hide()
         db_group_layout = self._seq_db_box.layout()
         use_ids_field   = self._fields['use_sequences'].field
         row = db_group_layout.rowCount()
-        db_group_layout.addWidget(self._seq_db_widget, row, 1)
+        db_group_layout.addWidget(self._seq_filter, row, 1)
+        db_group_layout.addWidget(self._seq_db_widget, row+1, 1)
         self._seq_db_widget.send_ids.connect(use_ids_field.setText)
+        self._seq_db_widget.send_changes.connect(use_ids_field.change_items)
         use_ids_field.textChanged.connect(self._seq_db_widget.set_ids)        
 
 
@@ -294,15 +359,20 @@ class DegenPrimerGUI(DegenPrimerConfig, QMainWindow):
     @pyqtSlot('QString')
     def _load_config(self, config_file):
         self._fields_empty = True
-        self.terminalOutput.clear()
-        self._clear_results()
+        #keep output and reports of the jobs that are still running
+        if not self._queue_busy():
+            self._terminal_buffer.clear()
+            self._clear_results()
         if config_file and os.path.isfile(unicode(config_file)): 
-            self._cwdir = os.path.dirname(unicode(config_file)) or '.'
-            self._set_field(self._cwdir_option, 
-                            os.path.abspath(self._cwdir))
-            os.chdir(self._cwdir)
+            #the configuration is parsed in its own directory
+            config_file = os.path.abspath(unicode(config_file))
+            self._cwdir = os.path.dirname(config_file)
+            self._set_field(self._cwdir_option, self._cwdir)
         self._config_file = config_file
-        self._parse_and_check()
+        #an empty configuration has nothing to check; this also keeps 
+        #the analysis tasks from being imported before the window is shown
+        if config_file: self._parse_and_check()
+        else: self._parse()
         self._job_id_label.setText(('<p align=center><b>Analysis ID:</b> '
                                     '%s</p>') % self.job_id) 
     
@@ -313,6 +383,8 @@ class DegenPrimerGUI(DegenPrimerConfig, QMainWindow):
         if not self._parse_and_check(): return
         #set working directory
         self._change_cwdir()
+        if not self._config_file:
+            self._config_file = os.path.join(self._cwdir, '%s.cfg' % self.job_id)
         #save configuration to the file
         self.save_configuration()
         #load saved configuration
@@ -342,14 +414,22 @@ class DegenPrimerGUI(DegenPrimerConfig, QMainWindow):
             file_dialog.fileSelected.connect(self._cwdir_option.field.setText)
             file_dialog.exec_()
             cwdir = self._get_field(self._cwdir_option)
-        self._cwdir = cwdir
-        os.chdir(self._cwdir)
-        print '\nWorking directory is %s\n' % os.getcwd()
+        self._cwdir = os.path.abspath(cwdir)
+        print '\nWorking directory is %s\n' % self._cwdir
+    
     
+    def _in_cwdir(self, func, *args):
+        #relative paths in a configuration are relative to its directory;
+        #the working directory of the GUI is changed only for the call
+        cwd = os.getcwd()
+        try: os.chdir(self._cwdir)
+        except OSError: pass
+        try: return func(*args)
+        finally: os.chdir(cwd)
     
     def _parse(self):
         try:
-            self.parse_configuration(self._config_file)
+            self._in_cwdir(self.parse_configuration, self._config_file)
         except ValueError, e:
             self._fields_empty = False
             self.write('\n'+e.message)
@@ -357,81 +437,87 @@ class DegenPrimerGUI(DegenPrimerConfig, QMainWindow):
         return True
     
     def _parse_and_check(self):
-        return self._parse() and AnalysisTask.check_options(self)
+        AnalysisTask, _OptimizationTask = _tasks()
+        return self._parse() and self._in_cwdir(AnalysisTask.check_options, self)
     
     
     @pyqtSlot()
     def _analyse(self):
         #try to parse configuration and check it
         if not self._parse(): return
-        if OptimizationTask.check_options(self) \
-        or AnalysisTask.check_options(self):
-            self._pipeline_thread.set_data(self.options)
+        AnalysisTask, OptimizationTask = _tasks()
+        if self._in_cwdir(OptimizationTask.check_options, self) \
+        or self._in_cwdir(AnalysisTask.check_options, self):
+            options = self.options
+            job_id  = self.job_id
+            self._change_cwdir()
             if self._config_file:
-                self._change_cwdir()
                 self.save_configuration(silent=True)
                 self.load_config(self._config_file)
             else: 
-                self.terminalOutput.clear()
+                if not self._queue_busy(): self._terminal_buffer.clear()
                 self.reset_temporary_options()
                 self._update_fields()
             self.abortButton.setEnabled(True)
-            self.abortButton.setText('Abort')
-            self._pipeline_thread.start()
+            self.abortButton.setText('Abort all')
+            settings = {'profile': self._profile_checkbox.isChecked()}
+            self._queue.submit(job_id, options, self._cwdir, settings)
     
+    def _queue_busy(self):
+        #the queue is created after the fields are initialized
+        queue = getattr(self, '_queue', None)
+        return queue is not None and queue.busy
     
-    @pyqtSlot(bool)
-    def update_timer(self, time_string):
-        self.elapsedTimeLineEdit.setText(time_string)
+    @pyqtSlot(int)
+    def _set_workers(self, workers):
+        self._queue.workers = workers
+        self._settings.setValue('jobs/workers', workers)
     
 
     def _clear_results(self):
         while self.mainTabs.count() > 1:
+            widget = self.mainTabs.widget(1)
             self.mainTabs.removeTab(1)
+            if isinstance(widget, self.ReportWidget): widget.close_report()
         self._reports = []
+        self._shown_reports = set()
         self._del_seq_db()
     
     
     @pyqtSlot()
     def _reset_fields(self):
         self._set_field(self._config_option, '')
-        self.terminalOutput.clear()
+        self._terminal_buffer.clear()
         self._clear_results()
         self._load_config(None)
     
     
+    #for the job queue to call
+    #show abort button while there are jobs to run
+    @pyqtSlot(bool)
     def _show_run_specific_widgets(self, show=True):
         for widget in self._run_widgets:
             if show: widget.show()
             else: widget.hide()
-    
-    #for pipeline thread to call
-    #lock analyze and reset buttons while analysis is running
-    @pyqtSlot(bool)
-    def lock_buttons(self, lock=True):
-        for widget in self._idle_widgets:
-            widget.setEnabled(not lock)
-        self._show_run_specific_widgets(lock)
-
-    @pyqtSlot()
-    def unlock_buttons(self): self.lock_buttons(False)
+        if not show: self._queue_view.remove_finished()
     
     @classmethod
     def load_ui(cls, ui_file, widget):
-        npaths = len(cls._ui_path)
-        for i, path in enumerate(cls._ui_path):
-            try:
-                filepath = os.path.join(path, ui_file)
-                uic.loadUi(QString.fromUtf8(filepath), widget)
-                break
-            except (OSError, IOError):
-                if i == npaths-1:
-                    raise OSError('Error: unable to locate %s.' % ui_file)
+        setup_ui(ui_file, widget, cls._ui_path)
 
     class ReportWidget(QFrame):
-        _ui_file = 'ReportWidget.ui'
+        '''Report tab; the report file is loaded in the background 
+        when the tab is first shown and inserted chunk by chunk.
+        Reports larger than large_report bytes are not loaded at all,
+        but shown by a LargeTextView instead of the editor.
+        Search runs in the background over the whole report; all matches 
+        in view are highlighted and any of them can be jumped to.'''
+        _ui_file     = 'ReportWidget.ui'
+        large_report = 1<<24
+        #matches highlighted in the editor at a time
+        max_highlighted = 1000
         
-        def __init__(self, parent=None):
+        def __init__(self, parent=None, report_file=None):
             QFrame.__init__(self, parent=parent)
             DegenPrimerGUI.load_ui(self._ui_file, self)
             self.editor = self.findChild(QTextEdit, 'ReportTextEdit')
@@ -440,44 +526,264 @@ class DegenPrimerGUI(DegenPrimerConfig, QMainWindow):
             self.search.returnPressed.connect(self.find_next)
             QShortcut(QKeySequence(Qt.Key_F3), self, self.find_next)
             QShortcut(QKeySequence(Qt.Key_F2), self, self.find_prev)
+            #search options and match navigation
+            layout = self.layout()
+            self.regex_box = QCheckBox('Regex', self)
+            self.regex_box.setToolTip('Search for a regular expression')
+            self.case_box  = QCheckBox('Case', self)
+            self.case_box.setToolTip('Match case')
+            self.match_box = QSpinBox(self)
+            self.match_box.setToolTip('Go to match')
+            self.match_box.setKeyboardTracking(False)
+            self.match_box.setRange(0, 0)
+            self.match_box.setSuffix(' of 0')
+            layout.addWidget(self.regex_box, 0, 2)
+            layout.addWidget(self.case_box, 0, 3)
+            layout.addWidget(self.match_box, 0, 4)
+            layout.removeWidget(self.editor)
+            layout.addWidget(self.editor, 1, 0, 1, -1)
+            self.regex_box.toggled.connect(self._options_changed)
+            self.case_box.toggled.connect(self._options_changed)
+            self.match_box.valueChanged.connect(self._match_selected)
+            self.searcher = ReportSearch(self)
+            self.searcher.updated.connect(self._show_matches)
+            self.searcher.error.connect(self._show_search_error)
+            self.editor.verticalScrollBar().valueChanged.connect(self._highlight_visible)
+            self.editor.horizontalScrollBar().valueChanged.connect(self._highlight_visible)
             self.term = ''
+            self.report_file = report_file
+            self.loaded  = False
+            self.viewer  = None
+            self._loader = None
+            self._match  = None
+        #end def
+        
+        def load(self):
+            if self.loaded or self._loader is not None: return
+            try: size = os.path.getsize(self.report_file)
+            except OSError: size = 0
+            if size > self.large_report:
+                self._show_large()
+                return
+            self.editor.setUndoRedoEnabled(False)
+            self._loader = TextFileLoader(self.report_file)
+            #queued: one chunk per event loop iteration, none while waiting on disk
+            self._loader.ready.connect(self._insert_chunk)
+            self._loader.start()
+        #end def
+        
+        def _show_large(self):
+            self.loaded = True
+            try: self.viewer = LargeTextView(self.report_file, self)
+            except EnvironmentError, e:
+                print 'Unable to load report file: %s\n%s' % (self.report_file, str(e))
+                return
+            self.editor.hide()
+            self.layout().removeWidget(self.editor)
+            self.layout().addWidget(self.viewer, 1, 0, 1, -1)
+            self.setFocusProxy(self.viewer)
+            self.searcher.set_text(self.viewer.index.data)
+        #end def
+        
+        @pyqtSlot()
+        def _insert_chunk(self):
+            if self._loader is None: return
+            chunk = self._loader.get()
+            if chunk is None:
+                if self._loader.error:
+                    print 'Unable to load report file: %s\n%s' % (self.report_file, self._loader.error)
+                self._loader.wait()
+                self._loader = None
+                self.loaded  = True
+                self.editor.setUndoRedoEnabled(True)
+                self.searcher.set_text(unicode(self.editor.toPlainText()))
+            elif chunk:
+                first  = self.editor.document().isEmpty()
+                cursor = QTextCursor(self.editor.document())
+                cursor.movePosition(QTextCursor.End)
+                cursor.insertText(chunk)
+                if first: self.editor.moveCursor(QTextCursor.Start, QTextCursor.MoveAnchor)
+        #end def
+        
+        def close_report(self):
+            if self._loader is not None:
+                self._loader.stop()
+                self._loader = None
+            self.searcher.stop()
+            if self.viewer is not None: self.viewer.close_file()
+            self.deleteLater()
+        #end def
+        
+        def _position(self):
+            if self.viewer is not None: return self.viewer.position
+            return self.editor.textCursor().selectionStart()
+        #end def
+        
+        @pyqtSlot(object)
+        def _show_matches(self, results):
+            count = len(results) if results is not None else 0
+            self.match_box.blockSignals(True)
+            self.match_box.setRange(min(count, 1), count)
+            self.match_box.setSuffix(' of %d%s' % (count, '+' if results is not None 
+                                                   and not results.complete else ''))
+            self.match_box.setToolTip('Go to match')
+            self.match_box.blockSignals(False)
+            if self.viewer is not None: self.viewer.set_matches(results)
+            else: self._highlight_visible()
+            #search as you type: go to the first match after the cursor
+            if self._match is None and count:
+                self._go_to(results.nearest(self._position()-1))
+        #end def
+        
+        @pyqtSlot(str)
+        def _show_search_error(self, error):
+            self._show_matches(None)
+            self.match_box.setSuffix(' (invalid pattern)')
+            self.match_box.setToolTip(error)
+        #end def
+        
+        @pyqtSlot()
+        def _highlight_visible(self):
+            results = self.searcher.results
+            if self.viewer is not None: return
+            selections = []
+            if results is not None and len(results):
+                document = self.editor.document()
+                viewport = self.editor.viewport()
+                start = self.editor.cursorForPosition(QPoint(0, 0)).position()
+                end   = self.editor.cursorForPosition(QPoint(viewport.width(), 
+                                                             viewport.height())).position()
+                for i in islice(results.in_range(start, end+1), self.max_highlighted):
+                    m_start, m_end = results.match(i)
+                    selection = QTextEdit.ExtraSelection()
+                    selection.cursor = QTextCursor(document)
+                    selection.cursor.setPosition(m_start)
+                    selection.cursor.setPosition(m_end, QTextCursor.KeepAnchor)
+                    selection.format.setBackground(QColor(Qt.yellow))
+                    selections.append(selection)
+            self.editor.setExtraSelections(selections)
+        #end def
+        
+        def _go_to(self, i):
+            results = self.searcher.results
+            if results is None or not 0 <= i < len(results): return
+            start, end = results.match(i)
+            if self.viewer is not None:
+                if not self.viewer.show_match(start, end): return
+            else:
+                cursor = QTextCursor(self.editor.document())
+                cursor.setPosition(start)
+                cursor.setPosition(end, QTextCursor.KeepAnchor)
+                self.editor.setTextCursor(cursor)
+            self._match = i
+            self.match_box.blockSignals(True)
+            self.match_box.setValue(i+1)
+            self.match_box.blockSignals(False)
+        #end def
+        
+        def _step(self, backward):
+            results = self.searcher.results
+            if results is None or not len(results): return
+            if self._match is None: i = results.nearest(self._position(), backward)
+            else: i = (self._match+(-1 if backward else 1)) % len(results)
+            self._go_to(i)
+        #end def
+        
+        @pyqtSlot(int)
+        def _match_selected(self, number): self._go_to(number-1)
+        
+        @pyqtSlot(bool)
+        def _options_changed(self, _checked): self.find_text(self.search.text())
 
         @pyqtSlot('QString')
         def find_text(self, qstring):
-            self.term = str(qstring)
-            self.find_next()
+            self.term   = unicode(qstring)
+            self._match = None
+            self.searcher.search(self.term, self.regex_box.isChecked(), 
+                                 self.case_box.isChecked())
+        #end def
             
         @pyqtSlot()
-        def find_next(self):
-            if not self.term: return
-            self.editor.find(self.term)
+        def find_next(self): self._step(False)
             
         @pyqtSlot()
-        def find_prev(self):
-            if not self.term: return
-            self.editor.find(self.term, QTextDocument.FindBackward)
+        def find_prev(self): self._step(True)
+    
+    #show a single report tab as soon as the report is written
+    @pyqtSlot(str, str)
+    def show_report(self, report_name, report_file):
+        report_file = unicode(report_file)
+        if report_file in self._shown_reports: return
+        if not os.path.isfile(report_file):
+            print 'Unable to load report file: %s\nNo such file' % report_file
+            return
+        #the report is loaded when its tab is first shown
+        report_widget = self.ReportWidget(self.centralWidget(), report_file)
+        self.mainTabs.addTab(report_widget, report_name)
+        self._shown_reports.add(report_file)
+    
+    @pyqtSlot(int)
+    def _load_report_tab(self, index):
+        widget = self.mainTabs.widget(index)
+        if isinstance(widget, self.ReportWidget): widget.load()
+    
+    @pyqtSlot(object)
+    def _follow_job_progress(self, job):
+        shown = self._progress_view.job
+        #show a newly started job unless another one is being watched
+        if job is not shown and job.state == job.RUNNING \
+        and (shown is None or shown.state != shown.RUNNING):
+            self._progress_view.show_job(job)
+            #do not leave the log that is being paged
+            if self._terminal_buffer.following: self._terminal_buffer.set_log(job.log)
+        else: self._progress_view.update_job(job)
+    #end def
     
-    #show result tabs
-    @pyqtSlot()
-    def show_results(self):
-        if not self._reports: return
-        #display reports
-        for report_name, report_file in self._reports:
-            #load report
-            report_widget = self.ReportWidget(self.centralWidget())
-            try:
-                report_file = open(report_file, 'r')
-                report_text = report_file.read()
-                report_file.close()
-            except Exception, e:
-                print 'Unable to load report file: %s\n%s' % (report_file, str(e))
-                continue
-            report_widget.editor.insertPlainText(QString.fromUtf8(report_text))
-            report_widget.editor.moveCursor(QTextCursor.Start, QTextCursor.MoveAnchor)
-            self.mainTabs.addTab(report_widget, report_name)
+    @pyqtSlot(object)
+    def _watch_job(self, job):
+        '''Show the progress of the job; older output of the terminal 
+        is paged from its log'''
+        self._progress_view.show_job(job)
+        self._terminal_buffer.set_log(job.log)
+    #end def
+    
+    @pyqtSlot(object, object, str)
+    def show_profile(self, job, rows, filename):
+        view = ProfileView(rows, unicode(filename), self.centralWidget())
+        self.mainTabs.addTab(view, QString.fromUtf8('Profile: %s' % job.name))
+    
+    @pyqtSlot(object, str, str)
+    def _show_job_report(self, job, report_name, report_file):
+        self.show_report(report_name, report_file)
+    
+    #show result tabs of a finished job
+    @pyqtSlot(object)
+    def show_results(self, job):
+        if job.metrics:
+            print '\nResources used by %s:\n%s\n' % (job.name, format_metrics(job.metrics))
+        self.register_reports(job.reports)
+        if not job.reports: return
+        #display reports that were not streamed during the run
+        for report_name, report_file in job.reports:
+            self.show_report(report_name, report_file)
         #alert main window
         QApplication.alert(self)
     
+    @pyqtSlot(object, str)
+    def _show_stage_started(self, job, stage):
+        self.statusBar().showMessage('%s: %s: started' % (job.name, stage))
+    
+    @pyqtSlot(object, str, bool)
+    def _show_stage_finished(self, job, stage, success):
+        self.statusBar().showMessage('%s: %s: %s' % (job.name, stage, 'done' if success else 'failed'))
+    
+    @pyqtSlot(object, str, float, str)
+    def _show_progress(self, job, stage, fraction, text):
+        eta = job.eta
+        self.statusBar().showMessage('%s: %s: %s%d%%%s' % 
+                                     (job.name, stage, text+' ' if text else '', fraction*100,
+                                      '' if eta is None else ', %d s left' % eta))
+    
     @pyqtSlot()
     def _toggle_seq_db(self):
         if self._seq_db_widget is None:
@@ -485,30 +791,52 @@ class DegenPrimerGUI(DegenPrimerConfig, QMainWindow):
         else: self._toggle_seq_db_widget()
         
     @pyqtSlot(str)
-    def show_message(self, text):
-        self.terminalOutput.moveCursor(QTextCursor.End)
-        self._append_terminal_output.emit(QString.fromUtf8(text))
+    def show_message(self, text): self._terminal_buffer.append(text)
+    
+    @pyqtSlot('QPoint')
+    def _terminal_menu(self, pos):
+        menu = self.terminalOutput.createStandardContextMenu()
+        menu.addSeparator()
+        has_log   = self._terminal_buffer.log_file is not None
+        following = self._terminal_buffer.following
+        menu.addAction('Show older output', self._terminal_buffer.older).setEnabled(has_log)
+        menu.addAction('Show newer output', self._terminal_buffer.newer).setEnabled(not following)
+        menu.addAction('Follow output', self._terminal_buffer.follow).setEnabled(not following)
+        menu.exec_(self.terminalOutput.mapToGlobal(pos))
+    
+    @pyqtSlot(bool)
+    def _show_terminal_mode(self, following):
+        if following: self.statusBar().clearMessage()
+        else: self.statusBar().showMessage('Showing the output logged to %s' 
+                                           % self._terminal_buffer.log_file)
+    
+    @pyqtSlot(int)
+    def _show_terminal_stats(self, coalesced):
+        self.terminalOutput.setToolTip('%d messages shown in %d updates; '
+                                       'last update coalesced %d' %
+                                       (self._terminal_buffer.messages,
+                                        self._terminal_buffer.updates,
+                                        coalesced))
         
     #abort handler
     @pyqtSlot()
     def _abort_analysis(self):
-        if self._pipeline_thread.isRunning():
-            self._pipeline_thread_stop.emit()
+        if self._queue.busy:
+            self._queue.abort_all()
             self.abortButton.setEnabled(False)
             self.abortButton.setText('Aborting...')
     
     #close handler
     def closeEvent(self, event):
-        if self._pipeline_thread.isRunning():
-            if QMessageBox.question(None, '', 'The analysis thread is still running. '
+        if self._queue.busy:
+            if QMessageBox.question(None, '', 'Some analyses are still running. '
                                     'If you quit now a loss of data may occure.\n'
                                     'Are you sure you want to quit?',
                                     QMessageBox.Yes | QMessageBox.No,
-                                    QMessageBox.No) == QMessageBox.Yes:
-                del self._pipeline_thread
-            else: 
+                                    QMessageBox.No) != QMessageBox.Yes:
                 event.ignore()
                 return
+        self._queue.shutdown()
         self._save_mainwindow_state() 
         event.accept()
 #end class
\ No newline at end of file
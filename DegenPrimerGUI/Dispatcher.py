@@ -0,0 +1,162 @@
+# coding=utf-8
+#
+# Copyright (C) 2013 Allis Tauri <allista@gmail.com>
+#
+# DegenPrimerGUI is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# DegenPrimerGUI is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Created on Oct 18, 2026
+
+@author: Allis Tauri <allista@gmail.com>
+'''
+
+import os
+import re
+import errno
+import fcntl
+import select
+
+
+class _Source(object):
+    '''A readable file descriptor registered in a Dispatcher'''
+    def __init__(self, fd, on_eof):
+        self.fd      = fd
+        self._on_eof = on_eof
+
+    def eof(self):
+        if self._on_eof is not None: self._on_eof()
+
+    def read(self):
+        '''Handle readiness; return False on EOF'''
+        return False
+#end class
+
+
+class _ConnectionSource(_Source):
+    def __init__(self, connection, on_recv, on_eof):
+        _Source.__init__(self, connection.fileno(), on_eof)
+        self._con     = connection
+        self._on_recv = on_recv
+
+    def read(self):
+        #handle every message that has already arrived
+        while self._con.poll():
+            try: msg = self._con.recv()
+            except (EOFError, IOError): return False
+            self._on_recv(msg)
+        return True
+#end class
+
+
+class _StreamSource(_Source):
+    #a carriage return ends a line as well, so that the progress 
+    #that is rewritten in place is passed on as it comes
+    _line = re.compile('[^\r\n]*[\r\n]')
+    
+    def __init__(self, stream, on_line, on_eof, encoding):
+        _Source.__init__(self, stream.fileno(), on_eof)
+        self._on_line  = on_line
+        self._encoding = encoding
+        self._buffer   = ''
+        flags = fcntl.fcntl(self.fd, fcntl.F_GETFL)
+        fcntl.fcntl(self.fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+
+    def _send(self, line):
+        self._on_line(line.decode(self._encoding, 'replace'))
+
+    def flush(self):
+        if self._buffer: self._send(self._buffer)
+        self._buffer = ''
+
+    def read(self):
+        try: data = os.read(self.fd, 1<<16)
+        except OSError, e:
+            if e.errno in (errno.EAGAIN, errno.EINTR): return True
+            data = ''
+        if not data:
+            self.flush()
+            return False
+        data = self._buffer+data
+        end  = 0
+        for match in self._line.finditer(data):
+            self._send(match.group())
+            end = match.end()
+        self._buffer = data[end:]
+        return True
+#end class
+
+
+class Dispatcher(object):
+    '''Waits with a single poll() on a connection and on the output
+    streams of a subprocess and calls the handlers of those that are ready.
+    Idle waiting takes no CPU and EOF of a source is seen immediately.'''
+
+    _mask = select.POLLIN | select.POLLPRI | select.POLLHUP | select.POLLERR
+
+    def __init__(self, encoding='UTF-8'):
+        self._poll     = select.poll()
+        self._sources  = dict()
+        self._encoding = encoding
+    #end def
+
+    def _add(self, source):
+        self._sources[source.fd] = source
+        self._poll.register(source.fd, self._mask)
+
+    def add_connection(self, connection, on_recv, on_eof=None):
+        '''on_recv(object) is called for every received object'''
+        self._add(_ConnectionSource(connection, on_recv, on_eof))
+
+    def add_stream(self, stream, on_line, on_eof=None):
+        '''on_line(unicode) is called for every line read from the stream'''
+        self._add(_StreamSource(stream, on_line, on_eof, self._encoding))
+
+    def remove(self, fd):
+        if fd not in self._sources: return
+        self._poll.unregister(fd)
+        del self._sources[fd]
+    #end def
+
+    def __len__(self): return len(self._sources)
+
+    def clear(self):
+        for fd in self._sources.keys(): self.remove(fd)
+
+    def drain(self):
+        '''Read whatever is left in the streams without blocking'''
+        for source in self._sources.values():
+            if not isinstance(source, _StreamSource): continue
+            while source.read():
+                if not select.select([source.fd], [], [], 0)[0]: break
+            source.flush()
+    #end def
+
+    def poll(self, timeout=None):
+        '''Wait for ready sources and handle them.
+        Timeout is in seconds; None means wait forever.
+        Sources that reached EOF are removed.'''
+        if not self._sources: return
+        if timeout is not None: timeout *= 1000
+        try: events = self._poll.poll(timeout)
+        except select.error, e:
+            if e.args[0] == errno.EINTR: return
+            raise
+        for fd, _event in events:
+            source = self._sources.get(fd)
+            if source is None: continue
+            if not source.read():
+                self.remove(fd)
+                source.eof()
+    #end def
+#end class
@@ -0,0 +1,319 @@
+# coding=utf-8
+#
+# Copyright (C) 2013 Allis Tauri <allista@gmail.com>
+#
+# DegenPrimerGUI is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# DegenPrimerGUI is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Created on Oct 18, 2026
+
+@author: Allis Tauri <allista@gmail.com>
+'''
+
+import os
+import re
+from time import time
+from collections import deque, OrderedDict
+from multiprocessing import cpu_count
+from PyQt4.QtCore import QObject, pyqtSignal, pyqtSlot
+
+from .SubprocessThread import SubprocessThread
+from .TerminalLog import RotatingLog
+
+
+class Job(object):
+    '''A single analysis run: options, working directory and state'''
+
+    QUEUED   = 'queued'
+    RUNNING  = 'running'
+    ABORTING = 'aborting'
+    DONE     = 'done'
+    FAILED   = 'failed'
+    ABORTED  = 'aborted'
+
+    def __init__(self, name, options, cwd, settings=None):
+        self.name     = name
+        self.options  = options
+        self.settings = settings
+        self.cwd      = os.path.abspath(cwd)
+        self.state    = self.QUEUED
+        self.reports  = []
+        self.metrics  = None
+        self.log      = None
+        self.stage    = None
+        self.step     = ''
+        self.fraction = 0.0
+        #(stage, step): [fraction, start time, end time]
+        self.progress = OrderedDict()
+        self._time0   = None
+        self._time1   = None
+    #end def
+
+    @property
+    def active(self): return self.state in (self.QUEUED, self.RUNNING, self.ABORTING)
+
+    @property
+    def elapsed(self):
+        if self._time0 is None: return 0
+        return (self._time1 or time())-self._time0
+    #end def
+
+    @property
+    def eta(self):
+        '''Estimated seconds left in the current step or stage; 
+        None if unknown'''
+        rec = self.progress.get((self.stage, self.step))
+        if rec is None or rec[2] is not None: return None
+        fraction, start, _end = rec
+        if not 0 < fraction < 1: return None
+        return (time()-start)*(1-fraction)/fraction
+    #end def
+    
+    def update_progress(self, stage, fraction, step=''):
+        now = time()
+        if self.step and (stage, step) != (self.stage, self.step):
+            prev = self.progress.get((self.stage, self.step))
+            if prev is not None and prev[2] is None: prev[2] = now
+        self.stage = stage; self.step = step; self.fraction = fraction
+        rec = self.progress.get((stage, step))
+        if rec is None: 
+            rec = self.progress[(stage, step)] = [fraction, now, None]
+        else: rec[0] = fraction
+        if step: #the whole stage is in progress while a step is
+            self.progress.setdefault((stage, ''), [0.0, now, None])
+        elif fraction >= 1: rec[2] = now
+    #end def
+    
+    def finish_stage(self, stage):
+        now = time()
+        for (rec_stage, _step), rec in self.progress.iteritems():
+            if rec_stage == stage and rec[2] is None: rec[2] = now
+        if stage == self.stage: self.step = ''
+    #end def
+
+    def start(self):
+        self.state  = self.RUNNING
+        self._time0 = time()
+        try: self.log = RotatingLog(os.path.join(self.cwd, '%s.log' % self.name))
+        except (IOError, OSError), e:
+            print 'Unable to open log for %s:\n%s' % (self.name, str(e))
+    #end def
+
+    def finish(self, success):
+        self._time1 = time()
+        if self.state == self.ABORTING: self.state = self.ABORTED
+        else: self.state = self.DONE if success else self.FAILED
+        if self.log is not None: self.log.close()
+    #end def
+#end class
+
+
+class JobQueue(QObject):
+    '''Runs queued jobs in persistent pipeline subprocesses, at most
+    workers jobs at a time. Each job is run in its own working directory
+    by the subprocess; the working directory of the GUI is not changed.'''
+
+    job_added        = pyqtSignal(object)
+    job_changed      = pyqtSignal(object)
+    job_finished     = pyqtSignal(object)
+    report_ready     = pyqtSignal(object, str, str)
+    profile_ready    = pyqtSignal(object, object, str)
+    stage_started    = pyqtSignal(object, str)
+    stage_finished   = pyqtSignal(object, str, bool)
+    progress         = pyqtSignal(object, str, float, str)
+    message_received = pyqtSignal(str)
+    busy_changed     = pyqtSignal(bool)
+
+    _line_start = re.compile(r'(^|\r)(?=[^\r\n])', re.M)
+
+    def __init__(self, module, workers=None, parent=None):
+        QObject.__init__(self, parent)
+        self._module  = module
+        self._workers = workers or cpu_count()
+        self._queue   = deque()
+        self._idle    = []
+        self._running = dict()
+        self.jobs     = []
+    #end def
+
+    @property
+    def workers(self): return self._workers
+
+    @workers.setter
+    def workers(self, num):
+        self._workers = max(1, num)
+        self._schedule()
+
+    @property
+    def busy(self): return bool(self._queue or self._running)
+
+    def _new_thread(self):
+        thread = SubprocessThread(self._module, persistent=True)
+        thread.finished.connect(self._on_finished)
+        thread.results_received.connect(self._on_results)
+        thread.report_ready.connect(self._on_report)
+        thread.profile_received.connect(self._on_profile)
+        thread.metrics_received.connect(self._on_metrics)
+        thread.stage_started.connect(self._on_stage_started)
+        thread.stage_finished.connect(self._on_stage_finished)
+        thread.progress.connect(self._on_progress)
+        thread.message_received.connect(self._on_message)
+        return thread
+    #end def
+
+    def _schedule(self):
+        was_busy = self.busy
+        while self._queue and len(self._running) < self._workers:
+            job = self._queue.popleft()
+            thread = self._idle.pop() if self._idle else self._new_thread()
+            self._running[thread] = job
+            job.start()
+            thread.set_data(job.options, job.cwd, job.settings)
+            thread.start()
+            self.job_changed.emit(job)
+        #stop the warm workers beyond the current limit
+        while self._idle and len(self._idle)+len(self._running) > self._workers:
+            self._idle.pop().shutdown()
+        if was_busy != self.busy: self.busy_changed.emit(self.busy)
+    #end def
+
+    def submit(self, name, options, cwd, settings=None):
+        '''Queue a job; returns the Job or None if the same job is
+        already queued or running in the same directory.
+        settings are passed to the subprocess along with the options.'''
+        cwd = os.path.abspath(cwd)
+        for job in self.jobs:
+            if job.active and job.name == name and job.cwd == cwd:
+                print '\nJob %s is already queued in %s\n' % (name, cwd)
+                return None
+        job = Job(name, options, cwd, settings)
+        self.jobs.append(job)
+        was_busy = self.busy
+        self._queue.append(job)
+        self.job_added.emit(job)
+        if not was_busy: self.busy_changed.emit(True)
+        self._schedule()
+        return job
+    #end def
+
+    def _thread_job(self):
+        return self._running.get(self.sender())
+
+    @pyqtSlot(object)
+    def _on_results(self, reports):
+        job = self._thread_job()
+        if job is not None: job.reports.extend(reports)
+
+    @pyqtSlot(str, str)
+    def _on_report(self, name, filename):
+        job = self._thread_job()
+        if job is not None: self.report_ready.emit(job, name, filename)
+
+    @pyqtSlot(object, str)
+    def _on_profile(self, rows, filename):
+        job = self._thread_job()
+        if job is not None: self.profile_ready.emit(job, rows, filename)
+
+    @pyqtSlot(object, str)
+    def _on_metrics(self, metrics, filename):
+        job = self._thread_job()
+        if job is not None: job.metrics = metrics
+
+    @pyqtSlot(str)
+    def _on_stage_started(self, stage):
+        job = self._thread_job()
+        if job is None: return
+        job.update_progress(unicode(stage), 0.0)
+        self.stage_started.emit(job, stage)
+        self.job_changed.emit(job)
+    #end def
+    
+    @pyqtSlot(str, bool)
+    def _on_stage_finished(self, stage, success):
+        job = self._thread_job()
+        if job is None: return
+        job.finish_stage(unicode(stage))
+        self.stage_finished.emit(job, stage, success)
+        self.job_changed.emit(job)
+    
+    @pyqtSlot(str, float, str)
+    def _on_progress(self, stage, fraction, text):
+        job = self._thread_job()
+        if job is None: return
+        job.update_progress(unicode(stage), fraction, unicode(text))
+        self.progress.emit(job, stage, fraction, text)
+        self.job_changed.emit(job)
+    #end def
+    
+    @pyqtSlot(str)
+    def _on_message(self, text):
+        job = self._thread_job()
+        if job is None:
+            self.message_received.emit(text)
+            return
+        text = unicode(text)
+        if job.log is not None: job.log.write(text)
+        #mark the lines of concurrent jobs
+        prefix = u'[%s] ' % job.name
+        self.message_received.emit(self._line_start.sub(lambda m: m.group(1)+prefix, text))
+    #end def
+
+    @pyqtSlot(bool)
+    def _on_finished(self, success):
+        thread = self.sender()
+        job = self._running.pop(thread, None)
+        #run() returns right after the signal; wait for it before reuse
+        thread.wait()
+        self._idle.append(thread)
+        if job is not None:
+            job.finish(success)
+            self.job_changed.emit(job)
+            self.job_finished.emit(job)
+        self._schedule()
+        if not self.busy: self.busy_changed.emit(False)
+    #end def
+
+    @pyqtSlot(object)
+    def abort(self, job):
+        if job.state == Job.QUEUED:
+            self._queue.remove(job)
+            job.state = Job.ABORTING
+            job.finish(False)
+            self.job_changed.emit(job)
+            if not self.busy: self.busy_changed.emit(False)
+            return
+        for thread, running in self._running.items():
+            if running is job and job.state == Job.RUNNING:
+                job.state = Job.ABORTING
+                thread.stop()
+                self.job_changed.emit(job)
+                break
+    #end def
+
+    @pyqtSlot()
+    def abort_all(self):
+        for job in list(self._queue)+self._running.values():
+            self.abort(job)
+
+    def shutdown(self):
+        '''Abort all jobs and stop the worker subprocesses'''
+        self._queue.clear()
+        for thread, job in self._running.items():
+            if job.state == Job.RUNNING: thread.stop()
+        for thread in self._running.keys()+self._idle:
+            thread.shutdown()
+        self._running.clear()
+        self._idle = []
+    #end def
+#end class
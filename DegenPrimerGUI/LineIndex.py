@@ -0,0 +1,166 @@
+# coding=utf-8
+#
+# Copyright (C) 2013 Allis Tauri <allista@gmail.com>
+#
+# DegenPrimerGUI is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# DegenPrimerGUI is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Created on Oct 18, 2026
+
+@author: Allis Tauri <allista@gmail.com>
+'''
+
+import os
+import mmap
+from array import array
+from bisect import bisect_right
+
+
+class LineIndex(object):
+    '''Line access to a memory-mapped text file.
+    Only the offset of every stride-th line is stored, so the index takes
+    about 8/stride bytes per line; any other line is found by scanning
+    at most stride-1 newlines from the nearest stored one.
+    The index is built chunk by chunk with index_chunk() and lines that
+    are already indexed may be read while it is being built.'''
+
+    stride     = 64
+    chunk_size = 1<<20
+    #longer lines are cut when read
+    max_line   = 1<<12
+
+    def __init__(self, filename, encoding='UTF-8'):
+        self.filename  = filename
+        self._encoding = encoding
+        self._file     = open(filename, 'rb')
+        self.size      = os.fstat(self._file.fileno()).st_size
+        #an empty file cannot be mapped
+        self._mm       = (mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                          if self.size else '')
+        #offsets of the lines 0, stride, 2*stride, ...
+        self._offsets  = array('L')
+        self._lines    = 0
+        self._indexed  = 0
+    #end def
+
+    def __del__(self): self.close()
+
+    def close(self):
+        if self._file is None: return
+        if self._mm: self._mm.close()
+        self._mm = ''
+        self._file.close()
+        self._file = None
+    #end def
+
+    def __len__(self): return self._lines
+
+    @property
+    def complete(self): return self._indexed >= self.size
+
+    @property
+    def indexed(self): return self._indexed
+
+    def _add_line(self, offset):
+        if self._lines % self.stride == 0: self._offsets.append(offset)
+        self._lines += 1
+    #end def
+
+    def index_chunk(self):
+        '''Index the next chunk of the file; returns False when done'''
+        if self.complete: return False
+        pos  = self._indexed
+        end  = min(pos+self.chunk_size, self.size)
+        data = self._mm[pos:end]
+        cut  = data.rfind('\n')
+        if cut < 0:
+            #a line longer than a chunk or the last line of the file
+            nl = self._mm.find('\n', end) if end < self.size else -1
+            self._add_line(pos)
+            self._indexed = nl+1 if nl >= 0 else self.size
+            return not self.complete
+        #pos is always at a line start; lines[j] ends at the j-th newline
+        lengths = map(len, data[:cut].split('\n'))
+        nlines  = len(lengths)
+        first   = (-self._lines) % self.stride
+        offset  = pos; j = 0
+        for k in xrange(first, nlines, self.stride):
+            offset += sum(lengths[j:k])+k-j; j = k
+            self._offsets.append(offset)
+        self._lines  += nlines
+        self._indexed = pos+cut+1
+        if end == self.size and self._indexed < self.size:
+            self._add_line(self._indexed)
+            self._indexed = self.size
+        return not self.complete
+    #end def
+
+    def build(self):
+        while self.index_chunk(): pass
+
+    def _line_start(self, line):
+        start = self._offsets[line // self.stride]
+        for _i in xrange(line % self.stride):
+            start = self._mm.find('\n', start)+1
+        return start
+    #end def
+
+    def offset(self, line):
+        '''Offset of the start of an indexed line'''
+        if not 0 <= line < self._lines: raise IndexError('line index out of range')
+        return self._line_start(line)
+    #end def
+
+    def line_at(self, offset):
+        '''Number of the line that contains the offset'''
+        k = bisect_right(self._offsets, offset)-1
+        if k < 0: return 0
+        start = self._offsets[k]
+        return min(k*self.stride+self._mm[start:offset].count('\n'),
+                   max(self._lines-1, 0))
+    #end def
+
+    def spans(self, first, count):
+        '''(start, end) offsets of up to count indexed lines
+        starting from first; end is the offset of the newline'''
+        spans = []
+        if not 0 <= first < self._lines: return spans
+        start = self._line_start(first)
+        for _i in xrange(min(count, self._lines-first)):
+            end = self._mm.find('\n', start)
+            if end < 0: end = self.size
+            spans.append((start, end))
+            start = end+1
+        return spans
+    #end def
+
+    def raw_lines(self, first, count):
+        '''Up to count indexed lines starting from first as byte strings,
+        without newlines and cut to max_line bytes'''
+        return [self._mm[start:min(end, start+self.max_line)]
+                for start, end in self.spans(first, count)]
+    #end def
+
+    def lines(self, first, count):
+        '''Same as raw_lines, but decoded'''
+        return [line.decode(self._encoding, 'replace')
+                for line in self.raw_lines(first, count)]
+    #end def
+
+    @property
+    def data(self):
+        '''The memory-mapped file; can be searched with the re module'''
+        return self._mm
+    #end def
+#end class
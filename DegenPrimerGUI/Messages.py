@@ -0,0 +1,78 @@
+# coding=utf-8
+#
+# Copyright (C) 2013 Allis Tauri <allista@gmail.com>
+#
+# DegenPrimerGUI is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# DegenPrimerGUI is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Created on Oct 18, 2026
+
+Typed messages sent by a subprocess to the server during a job.
+A message is a plain (kind, payload) tuple with payload being a dict:
+the subprocess imports this module as a top-level module while the GUI
+imports it from the package, so no classes are sent over the connection.
+
+@author: Allis Tauri <allista@gmail.com>
+'''
+
+PROGRESS       = 'progress'
+STAGE_STARTED  = 'stage-started'
+STAGE_FINISHED = 'stage-finished'
+REPORT_READY   = 'report-ready'
+RESULTS        = 'results'
+PROFILE        = 'profile'
+METRICS        = 'metrics'
+JOB_DONE       = 'job-done'
+
+KINDS = (PROGRESS, STAGE_STARTED, STAGE_FINISHED, REPORT_READY, RESULTS, 
+         PROFILE, METRICS, JOB_DONE)
+
+
+def message(kind, **payload):
+    if kind not in KINDS:
+        raise ValueError('Unknown message kind: %s' % kind)
+    return (kind, payload)
+
+def progress(stage, fraction, text=''):
+    return message(PROGRESS, stage=stage, fraction=fraction, text=text)
+
+def stage_started(stage):
+    return message(STAGE_STARTED, stage=stage)
+
+def stage_finished(stage, success=True):
+    return message(STAGE_FINISHED, stage=stage, success=success)
+
+def report_ready(name, filename):
+    return message(REPORT_READY, name=name, filename=filename)
+
+def results(data):
+    return message(RESULTS, data=data)
+
+def profile(rows, filename):
+    '''rows are (function, calls, primitive calls, total time, cumulative time)'''
+    return message(PROFILE, rows=rows, filename=filename)
+
+def metrics(data, filename):
+    '''data is a dict of Telemetry metrics'''
+    return message(METRICS, data=data, filename=filename)
+
+def job_done(result):
+    '''The closing message of a job; result is 0 on success'''
+    return message(JOB_DONE, result=result)
+
+
+def is_message(obj):
+    return (isinstance(obj, tuple) and len(obj) == 2
+            and obj[0] in KINDS and isinstance(obj[1], dict))
+#end def
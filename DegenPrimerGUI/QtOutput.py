@@ -24,7 +24,8 @@ Created on Feb 5, 2016
 import os, errno
  
 from BioUtils.Tools.Output import OutIntercepter
-from PyQt4.QtCore import QThread, pyqtSignal
+from PyQt4.QtCore import QObject, QThread, QTimer, pyqtSignal, pyqtSlot
+from PyQt4.QtGui import QTextCursor
 from Queue import Queue
 
 class QtOutput(OutIntercepter, Queue):
@@ -78,4 +79,185 @@ class QtOutput(OutIntercepter, Queue):
     def __exit__(self, _type, _value, _traceback):
         self._reader.stop()
         self._reader = None
-        return OutIntercepter.__exit__(self, _type, _value, _traceback)
\ No newline at end of file
+        return OutIntercepter.__exit__(self, _type, _value, _traceback)
+
+
+class TerminalBuffer(QObject):
+    '''Collects messages for a QPlainTextEdit and appends them in a single 
+    edit once per frame. A carriage return rewrites the last line in place, 
+    as progress bars in a terminal expect.
+    The terminal keeps only the last capacity lines. If a log is set, 
+    a RotatingLog written elsewhere, like the log of a job in its working
+    directory, older output may be paged back into the terminal from it.
+    New output is then kept aside and shown, after the output that was 
+    shown before, when the terminal follows the output again.'''
+    
+    #number of messages coalesced into the last update
+    coalesced = pyqtSignal(int)
+    #emitted when the terminal starts or stops following the output
+    following_changed = pyqtSignal(bool)
+    
+    def __init__(self, terminal, interval=40, capacity=5000, parent=None):
+        QObject.__init__(self, parent)
+        self._terminal = terminal
+        self._terminal.setMaximumBlockCount(capacity)
+        self._capacity = capacity
+        self._pending  = []
+        self._carriage = False
+        #log and the window of it shown while paging
+        self._log       = None
+        self._following = True
+        self._top       = 0
+        self._bottom    = 0
+        #the output shown before paging and the output added since
+        self._shown     = None
+        self._missed    = []
+        #statistics
+        self.messages  = 0
+        self.updates   = 0
+        #flush timer
+        self._timer = QTimer(self)
+        self._timer.setInterval(interval)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.flush)
+    #end def
+    
+    @property
+    def following(self): return self._following
+    
+    @property
+    def log_file(self): return self._log.filename if self._log else None
+    
+    def set_log(self, log):
+        '''Page older output from the log; None stops paging'''
+        self.follow()
+        self._log = log
+    #end def
+    
+    @pyqtSlot(str)
+    def append(self, text):
+        self._pending.append(unicode(text))
+        self.messages += 1
+        if not self._timer.isActive(): self._timer.start()
+    #end def
+    
+    def clear(self):
+        '''Drop pending messages and clear the terminal'''
+        self._timer.stop()
+        self._pending  = []
+        self._carriage = False
+        self._shown    = None
+        self._missed   = []
+        self._set_following(True)
+        self._terminal.clear()
+    #end def
+    
+    @staticmethod
+    def _visible(line):
+        visible = [p for p in line.split(u'\r') if p]
+        return visible[-1] if visible else u''
+    
+    def _write_line(self, cursor, line):
+        if u'\r' not in line and not self._carriage:
+            cursor.insertText(line)
+            return
+        #replace the current line with the last text after a carriage return
+        visible = self._visible(line)
+        cursor.movePosition(QTextCursor.StartOfBlock, QTextCursor.KeepAnchor)
+        cursor.insertText(visible or cursor.block().text())
+        self._carriage = line.endswith(u'\r')
+    #end def
+    
+    @pyqtSlot()
+    def flush(self):
+        if not self._pending: return
+        count = len(self._pending)
+        text  = u''.join(self._pending).replace(u'\r\n', u'\n')
+        self._pending = []
+        if self._following: self._append(text)
+        else:
+            self._missed.append(text)
+            #only the last capacity lines will be shown
+            if len(self._missed) > self._capacity:
+                lines = u''.join(self._missed).split(u'\n')
+                self._missed = [u'\n'.join(lines[-self._capacity:])]
+        self.updates += 1
+        self.coalesced.emit(count)
+    #end def
+    
+    def _append(self, text):
+        #keep scrolling with the output only if the view was at the bottom
+        scrollbar = self._terminal.verticalScrollBar()
+        at_bottom = scrollbar.value() == scrollbar.maximum()
+        cursor = QTextCursor(self._terminal.document())
+        cursor.movePosition(QTextCursor.End)
+        cursor.beginEditBlock()
+        for i, line in enumerate(text.split(u'\n')):
+            if i > 0: 
+                cursor.insertText(u'\n')
+                self._carriage = False
+            if line: self._write_line(cursor, line)
+        cursor.endEditBlock()
+        if at_bottom: scrollbar.setValue(scrollbar.maximum())
+    #end def
+    
+    def _set_following(self, following):
+        if following == self._following: return
+        self._following = following
+        self.following_changed.emit(following)
+    #end def
+    
+    def _show_lines(self, lines, scroll_to_end):
+        self._terminal.setPlainText(u'\n'.join(self._visible(line) for line in lines))
+        scrollbar = self._terminal.verticalScrollBar()
+        scrollbar.setValue(scrollbar.maximum() if scroll_to_end else 0)
+    #end def
+    
+    @pyqtSlot()
+    def older(self):
+        '''Show the page of logged output preceding the shown one'''
+        if self._log is None: return
+        self.flush()
+        if self._following:
+            #the terminal shows the output of all jobs; 
+            #the log is paged from its end
+            self._shown  = (unicode(self._terminal.toPlainText()), self._carriage)
+            self._missed = []
+            self._top    = self._log.end
+        if self._top <= self._log.begin: return
+        lines, top = self._log.read_before(self._top, self._capacity)
+        self._bottom = self._top
+        self._top    = top
+        self._set_following(False)
+        self._show_lines(lines, True)
+    #end def
+    
+    @pyqtSlot()
+    def newer(self):
+        '''Show the page of logged output following the shown one'''
+        if self._log is None or self._following: return
+        self.flush()
+        lines, bottom = self._log.read_after(self._bottom, self._capacity)
+        if bottom >= self._log.end: 
+            self.follow()
+            return
+        self._top    = self._bottom
+        self._bottom = bottom
+        self._show_lines(lines, False)
+    #end def
+    
+    @pyqtSlot()
+    def follow(self):
+        '''Show the tail of the output and keep following it'''
+        if self._following: return
+        self.flush()
+        self._set_following(True)
+        text, self._carriage = self._shown
+        self._terminal.setPlainText(text)
+        scrollbar = self._terminal.verticalScrollBar()
+        scrollbar.setValue(scrollbar.maximum())
+        self._append(u''.join(self._missed))
+        self._shown  = None
+        self._missed = []
+    #end def
+#end class
\ No newline at end of file
@@ -0,0 +1,384 @@
+# coding=utf-8
+#
+# Copyright (C) 2013 Allis Tauri <allista@gmail.com>
+#
+# DegenPrimerGUI is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# DegenPrimerGUI is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Created on Oct 18, 2026
+
+@author: Allis Tauri <allista@gmail.com>
+'''
+
+import os
+import re
+import glob
+import signal
+import marshal
+import hashlib
+from array import array
+from bisect import bisect_left
+from itertools import compress
+from multiprocessing import Pool, cpu_count
+
+from .SubprocessWorker import SubprocessWorker
+
+
+def _lower(text):
+    #byte strings are compared and sorted several times faster than unicode
+    if isinstance(text, unicode): text = text.encode('UTF-8')
+    return text.lower()
+#end def
+
+
+class SequenceIndex(object):
+    '''IDs and descriptions of the records of a sequence database with
+    the indexes to filter them: ID to row map, IDs sorted for prefix
+    search and lower-cased UTF-8 texts for substring search.
+    Rows are the positions of the records in the ids list.
+    Records may be added and their descriptions set as they become 
+    known; a description that is not known yet is None.'''
+
+    def __init__(self, ids=(), descriptions=None):
+        self.ids          = []
+        self.descriptions = []
+        self.rows         = dict()
+        self.described    = 0
+        self._texts       = []
+        #IDs sorted for prefix search; rebuilt when needed after changes
+        self._order       = None
+        self._sorted      = None
+        self._last        = None
+        self.extend(ids, descriptions)
+    #end def
+
+    def __len__(self): return len(self.ids)
+
+    @staticmethod
+    def _text(sid, description):
+        if description is None: return _lower(sid)
+        return '%s\t%s' % (_lower(sid), _lower(description))
+    #end def
+
+    def extend(self, ids, descriptions=None):
+        '''Add records; descriptions may be None or contain None'''
+        start = len(self.ids)
+        self.ids.extend(ids)
+        new = len(self.ids)-start
+        if descriptions is None: descriptions = [None]*new
+        else: descriptions = list(descriptions)
+        self.descriptions.extend(descriptions)
+        self.described += new-descriptions.count(None)
+        self.rows.update(zip(self.ids[start:], xrange(start, len(self.ids))))
+        self._texts.extend(self._text(sid, desc) for sid, desc
+                           in zip(self.ids[start:], descriptions))
+        if new: self._order = self._sorted = self._last = None
+    #end def
+
+    def set_descriptions(self, start, descriptions):
+        '''Descriptions of the records from the start row on'''
+        ids = self.ids
+        for row, desc in enumerate(descriptions, start):
+            if desc is None: continue
+            if self.descriptions[row] is None: self.described += 1
+            self.descriptions[row] = desc
+            self._texts[row] = self._text(ids[row], desc)
+        self._last = None
+    #end def
+
+    def _sort(self):
+        lowered      = [_lower(sid) for sid in self.ids]
+        order        = sorted(xrange(len(lowered)), key=lowered.__getitem__)
+        self._order  = array('L', order)
+        self._sorted = [lowered[i] for i in order]
+    #end def
+
+    def prefix(self, prefix, within=None):
+        '''Sorted rows of the records whose ID starts with prefix;
+        only the rows from the sorted within list are checked if it is given'''
+        prefix = _lower(prefix)
+        if within is not None:
+            texts = self._texts
+            return [row for row in within if texts[row].startswith(prefix)]
+        if self._sorted is None: self._sort()
+        start  = bisect_left(self._sorted, prefix)
+        end    = bisect_left(self._sorted, prefix+'\xff', start)
+        return sorted(self._order[start:end])
+    #end def
+
+    def substring(self, text, within=None):
+        '''Sorted rows of the records whose ID or description contains
+        text; only the rows from the sorted within list are checked if
+        it is given'''
+        text  = _lower(text)
+        texts = self._texts
+        if within is None:
+            return list(compress(xrange(len(texts)), [text in t for t in texts]))
+        return [row for row in within if text in texts[row]]
+    #end def
+
+    def search(self, query, within=None):
+        '''Sorted rows matching the query: IDs starting with the text
+        after ^, or IDs and descriptions containing the query text.
+        A query that extends the previous one is searched only among
+        the previous results.'''
+        if query.startswith('^'): return self.prefix(query[1:], within)
+        query = _lower(query)
+        if within is not None: return self.substring(query, within)
+        if self._last is not None and self._last[0] in query:
+            within = self._last[1]
+        rows = self.substring(query, within)
+        self._last = (query, rows)
+        return rows
+    #end def
+#end class
+
+
+class RowSelection(object):
+    '''Selected database rows kept as a bitmap with a byte per row.
+    Changes return the rows they have actually added or removed,
+    so that only the difference needs to be shown or sent.
+    Whole-bitmap operations run in C: bytearray.translate,
+    itertools.compress and regular expressions.'''
+
+    #translation table that swaps 0 and 1
+    _invert = bytearray([1, 0])+bytearray(xrange(2, 256))
+    _run    = re.compile('\x01+')
+
+    def __init__(self, size=0):
+        self._bits = bytearray(size)
+        self.count = 0
+    #end def
+
+    def __len__(self): return self.count
+
+    def __contains__(self, row): return bool(self._bits[row])
+
+    def resize(self, size):
+        '''Grow the bitmap for rows added to the database'''
+        if size > len(self._bits):
+            self._bits.extend(bytearray(size-len(self._bits)))
+    #end def
+
+    def rows(self):
+        '''Sorted selected rows'''
+        return list(compress(xrange(len(self._bits)), self._bits))
+
+    def select(self, items):
+        '''Items of a list indexed by rows, such as the IDs, that are selected'''
+        return list(compress(items, self._bits))
+
+    def add(self, rows):
+        bits  = self._bits
+        added = [row for row in rows if not bits[row]]
+        for row in added: bits[row] = 1
+        self.count += len(added)
+        return added
+    #end def
+
+    def discard(self, rows):
+        bits    = self._bits
+        removed = [row for row in rows if bits[row]]
+        for row in removed: bits[row] = 0
+        self.count -= len(removed)
+        return removed
+    #end def
+
+    def toggle(self, row):
+        '''Returns True if the row is selected now'''
+        if self._bits[row]: self.discard((row,))
+        else: self.add((row,))
+        return bool(self._bits[row])
+    #end def
+
+    def add_range(self, start, end):
+        '''Select the rows [start, end)'''
+        added = list(compress(xrange(start, end),
+                              self._bits[start:end].translate(self._invert)))
+        self._bits[start:end] = '\x01'*(end-start)
+        self.count += len(added)
+        return added
+    #end def
+
+    def invert(self, rows=None):
+        '''Invert the selection of the given rows or of all of them;
+        returns (added, removed)'''
+        if rows is not None:
+            bits    = self._bits
+            removed = [row for row in rows if bits[row]]
+            added   = [row for row in rows if not bits[row]]
+            for row in removed: bits[row] = 0
+            for row in added: bits[row] = 1
+            self.count += len(added)-len(removed)
+            return added, removed
+        removed = self.rows()
+        self._bits = self._bits.translate(self._invert)
+        self.count = len(self._bits)-self.count
+        return self.rows(), removed
+    #end def
+
+    def clear(self):
+        removed = self.rows()
+        self._bits = bytearray(len(self._bits))
+        self.count = 0
+        return removed
+    #end def
+
+    def set_rows(self, rows):
+        '''Select exactly the given unique rows; returns (added, removed)'''
+        old = self._bits
+        new = bytearray(len(old))
+        for row in rows: new[row] = 1
+        added   = [row for row in rows if not old[row]]
+        removed = [row for row in compress(xrange(len(old)), old) if not new[row]]
+        self._bits = new
+        self.count = len(rows)
+        return added, removed
+    #end def
+
+    def flags(self, rows):
+        '''Selection flags of the given rows as a bytearray'''
+        bits = self._bits
+        if isinstance(rows, xrange) and len(rows):
+            return bits[rows[0]:rows[-1]+1]
+        return bytearray(bits[row] for row in rows)
+    #end def
+
+    @classmethod
+    def runs(cls, flags):
+        '''(first, last) positions of the runs of set flags'''
+        return [(m.start(), m.end()-1) for m in cls._run.finditer(str(flags))]
+#end class
+
+
+def _ignore_interrupt():
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def index_file(filename):
+    '''Read a sequence file; returns (ids, descriptions, error).
+    Used by the worker processes that index files in parallel.'''
+    from BioUtils.SeqUtils import SeqView, pretty_rec_name
+    try:
+        view = SeqView()
+        view.load([filename])
+        ids  = view.keys()
+        descriptions = [pretty_rec_name(view[sid]) for sid in ids]
+        view.close()
+    except Exception, e:
+        return None, None, '%s: %s' % (e.__class__.__name__, str(e))
+    return ids, descriptions, None
+#end def
+
+
+def index_pool(files):
+    '''A pool of worker processes for index_file, 
+    at most one per file and per CPU'''
+    #the processes are forked at once; they must not inherit the child
+    #end of a socketpair of a pipeline subprocess that is being spawned
+    with SubprocessWorker._spawn_lock:
+        return Pool(min(cpu_count(), files), _ignore_interrupt)
+#end def
+
+
+def default_cache_dir():
+    cache = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(cache, 'degen_primer_gui', 'index')
+#end def
+
+
+class IndexCache(object):
+    '''On-disk cache of the IDs and descriptions of the records 
+    of sequence files, one entry per file. An entry is valid while 
+    the path, size and mtime of its file stay the same; stale entries 
+    are removed when found, and the least recently used ones are evicted
+    when the cache grows over max_size bytes.'''
+    
+    version = 1
+    
+    def __init__(self, directory=None, max_size=1<<28):
+        self.directory = directory or default_cache_dir()
+        self.max_size  = max_size
+    #end def
+    
+    @staticmethod
+    def _key(filename):
+        path = os.path.abspath(filename)
+        stat = os.stat(path)
+        return path, stat.st_size, stat.st_mtime
+    #end def
+    
+    def _entry(self, path):
+        if isinstance(path, unicode): path = path.encode('UTF-8')
+        return os.path.join(self.directory, hashlib.sha1(path).hexdigest()+'.idx')
+    
+    def _remove(self, entry):
+        try: os.remove(entry)
+        except OSError: pass
+    #end def
+    
+    def get(self, filename):
+        '''(ids, descriptions) of the records of the file or None;
+        descriptions that were not known when the entry was stored are None'''
+        try: key = self._key(filename)
+        except OSError: return None
+        entry = self._entry(key[0])
+        try:
+            with open(entry, 'rb') as inp:
+                if marshal.load(inp) != (self.version,)+key: raise ValueError
+                ids = marshal.load(inp)
+                descriptions = marshal.load(inp)
+            if len(ids) != len(descriptions): raise ValueError
+        except IOError: return None
+        except (EOFError, ValueError, TypeError):
+            #stale or broken
+            self._remove(entry)
+            return None
+        #the access time is not updated on every file system
+        try: os.utime(entry, None)
+        except OSError: pass
+        return ids, descriptions
+    #end def
+    
+    def put(self, filename, ids, descriptions):
+        try:
+            key   = self._key(filename)
+            entry = self._entry(key[0])
+            if not os.path.isdir(self.directory): os.makedirs(self.directory)
+            tmp = '%s.%d' % (entry, os.getpid())
+            with open(tmp, 'wb') as out:
+                marshal.dump((self.version,)+key, out, 2)
+                marshal.dump(list(ids), out, 2)
+                marshal.dump(list(descriptions), out, 2)
+            os.rename(tmp, entry)
+        except (IOError, OSError, ValueError), e:
+            print 'Unable to cache the index of %s:\n%s' % (filename, str(e))
+            return
+        self.evict()
+    #end def
+    
+    def evict(self):
+        '''Remove the least recently used entries over max_size'''
+        entries = []
+        for entry in glob.glob(os.path.join(self.directory, '*.idx')):
+            try: stat = os.stat(entry)
+            except OSError: continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+        total = sum(size for _mtime, size, _entry in entries)
+        for _mtime, size, entry in sorted(entries):
+            if total <= self.max_size: break
+            self._remove(entry)
+            total -= size
+    #end def
+#end class
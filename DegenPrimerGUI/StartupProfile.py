@@ -0,0 +1,115 @@
+# coding=utf-8
+#
+# Copyright (C) 2013 Allis Tauri <allista@gmail.com>
+#
+# DegenPrimerGUI is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# DegenPrimerGUI is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Created on Oct 18, 2026
+
+Startup profile of the GUI: time spent in every import and in every 
+startup phase up to the first paint of the main window.
+Qt is imported only when the first paint is watched, so that its own 
+import is measured too.
+
+@author: Allis Tauri <allista@gmail.com>
+'''
+
+import sys
+import threading
+import __builtin__
+from time import time
+
+
+class StartupProfile(object):
+    '''Records startup phases and, once installed, the inclusive and 
+    own time of every import that loads new modules'''
+    
+    def __init__(self, time0=None):
+        self._time0   = time0 or time()
+        self._phases  = [('start', self._time0)]
+        self._imports = [] #(name, inclusive, own)
+        #stacks of the children time of nested imports, one per thread
+        self._local   = threading.local()
+        self._import  = None
+        self._filter  = None
+        self.reported = False
+    #end def
+    
+    def install(self):
+        self._import = __builtin__.__import__
+        __builtin__.__import__ = self._timed_import
+    #end def
+    
+    def uninstall(self):
+        if self._import is None: return
+        __builtin__.__import__ = self._import
+        self._import = None
+    #end def
+    
+    def _timed_import(self, name, *args, **kwargs):
+        nmodules = len(sys.modules)
+        stack = getattr(self._local, 'stack', None)
+        if stack is None: stack = self._local.stack = []
+        stack.append(0.0)
+        time0 = time()
+        try: return self._import(name, *args, **kwargs)
+        finally:
+            elapsed  = time()-time0
+            children = stack.pop()
+            if stack: stack[-1] += elapsed
+            if len(sys.modules) > nmodules:
+                self._imports.append((name, elapsed, elapsed-children))
+    #end def
+    
+    def phase(self, name):
+        self._phases.append((name, time()))
+    
+    def watch_first_paint(self, widget, callback=None):
+        '''Record the first paint of the widget as the last phase, 
+        then report and call the callback'''
+        from PyQt4.QtCore import QObject, QEvent
+        profile = self
+        class PaintFilter(QObject):
+            def eventFilter(self, obj, event):
+                if event.type() == QEvent.Paint:
+                    obj.removeEventFilter(self)
+                    profile.phase('first paint')
+                    profile.report()
+                    if callback is not None: callback()
+                return False
+        #end class
+        self._filter = PaintFilter(widget)
+        widget.installEventFilter(self._filter)
+    #end def
+    
+    def report(self, stream=None, top=25):
+        self.uninstall()
+        self.reported = True
+        out = stream or sys.__stderr__
+        out.write('\nStartup phases:\n%-30s %10s %10s\n' % ('phase', 'at, ms', 'took, ms'))
+        prev = self._time0
+        for name, when in self._phases[1:]:
+            out.write('%-30s %10.1f %10.1f\n' % (name, (when-self._time0)*1e3, (when-prev)*1e3))
+            prev = when
+        total = sum(own for _name, _inclusive, own in self._imports)
+        out.write('\nImports: %d, %.1f ms in total; top %d by own time:\n' 
+                  % (len(self._imports), total*1e3, top))
+        out.write('%-40s %10s %12s\n' % ('module', 'own, ms', 'incl., ms'))
+        for name, inclusive, own in sorted(self._imports, key=lambda i: i[2], reverse=True)[:top]:
+            out.write('%-40s %10.1f %12.1f\n' % (name, own*1e3, inclusive*1e3))
+        out.write('\n')
+        out.flush()
+    #end def
+#end class
@@ -24,15 +24,49 @@ Created on Nov 10, 2013
 import os
 import sys
 import abc
+import mmap
 import signal
 import argparse
 import traceback
 import multiprocessing.connection as mpc
-import BioUtils.Tools.tmpStorage as tmpStorage
-from BioUtils.Tools.UMP import ignore_interrupt
-from multiprocessing.managers import SyncManager
-from threading import Thread
-from time import sleep
+from _multiprocessing import Connection
+import Messages
+try: import BioUtils.Tools.tmpStorage as tmpStorage
+except ImportError: tmpStorage = None #a stand-in pipeline may run without it
+from threading import Thread, Lock
+from time import sleep, time
+
+
+def clean_tmp_files():
+    if tmpStorage is not None: tmpStorage.clean_tmp_files()
+
+
+class SharedEvent(object):
+    '''Event-like flag kept in an anonymous shared memory page.
+    Processes forked after its creation see the same flag, so checking it
+    is a plain memory read instead of an IPC round-trip to a manager.'''
+    
+    _poll_interval = 0.01
+    
+    def __init__(self):
+        self._flag = mmap.mmap(-1, 1)
+        self._flag[0] = '\0'
+    
+    def is_set(self): return self._flag[0] != '\0'
+    isSet = is_set
+    
+    def set(self): self._flag[0] = '\1'
+    
+    def clear(self): self._flag[0] = '\0'
+    
+    def wait(self, timeout=None):
+        if timeout is not None: end = time()+timeout
+        while not self.is_set():
+            if timeout is not None and time() >= end: break
+            sleep(self._poll_interval)
+        return self.is_set()
+    #end def
+#end class
 
 
 class SignalListener(Thread):
@@ -45,9 +79,12 @@ class SignalListener(Thread):
     #end def
     
     def _handle_signal(self):
-        sig = self._con.recv()
-        if sig == self._signal:
-            self._event.set()
+        #listen until the server acknowledges the end of the job
+        while True:
+            sig = self._con.recv()
+            if sig is None: break
+            if sig == self._signal:
+                self._event.set()
     #end def
     
     def run(self):
@@ -85,24 +122,24 @@ class SubprocessBase(object):
     def __init__(self):
         self._pid  = os.getpid()
         #abort event
-        self._mgr  = SyncManager()
-        self._mgr.start(ignore_interrupt)
-        self._abort_event = self._mgr.Event()
+        self._abort_event = SharedEvent()
         #stdout/err
         self._err  = StreamEncoder(sys.stderr)
         self._out  = StreamEncoder(sys.stdout)
         #connection information
         self._port = None
+        self._fd   = None
         self._con  = None
+        #messages may be sent from several threads of a job
+        self._send_lock = Lock()
+        #serve many jobs over a single connection
+        self._persistent = False
+        #settings of the current job
+        self._settings   = dict()
         self()
     #end def
     
-    def __del__(self):
-        if self._con is not None:
-            self.terminate()
-            self._con.close()
-        self._mgr.shutdown()
-    #end def
+    def __del__(self): self._disconnect()
     
 
     def _check_tty(self):
@@ -116,7 +153,7 @@ class SubprocessBase(object):
         if self._pid != os.getpid(): return
         self._out.write('%d aborting...\n'%os.getpid())
         self._abort_event.set(); sleep(0.1)
-        tmpStorage.clean_tmp_files()
+        clean_tmp_files()
     #end def
         
     def _set_sig_handlers(self):
@@ -130,10 +167,18 @@ class SubprocessBase(object):
         parser = argparse.ArgumentParser(self._error_msg)
         conf_group = parser.add_argument_group('Preset configuration')
         conf_group.add_argument('port', metavar='number', 
-                                type=int, nargs=1,
+                                type=int, nargs='?',
                                 help='Port number to connect to.')
+        conf_group.add_argument('--fd', metavar='number', type=int,
+                                help='Inherited socket descriptor to use '
+                                'instead of a TCP port.')
+        conf_group.add_argument('--persistent', action='store_true',
+                                help='Serve jobs until the server '
+                                'sends a shutdown signal.')
         args = parser.parse_args()
-        self._port = args.port[0]
+        self._port = args.port
+        self._fd   = args.fd
+        self._persistent = args.persistent
     #end def
     
     def _get_auth_key(self):
@@ -141,7 +186,22 @@ class SubprocessBase(object):
         except: self._auth = None
     #end def
     
+    def _connect_fd(self):
+        try:
+            self._con = Connection(self._fd)
+            mpc.answer_challenge(self._con, self._auth)
+            mpc.deliver_challenge(self._con, self._auth)
+        except mpc.AuthenticationError, e:
+            self._err.write('Cannot authenticate through descriptor %d\n%s\n' % (self._fd,str(e)))
+            return False
+        except: 
+            traceback.print_exc()
+            return False
+        return True
+    #end def
+    
     def _connect(self):
+        if self._fd is not None: return self._connect_fd()
         if self._port is None: return False
         try: self._con = mpc.Client(('localhost', self._port), 
                                     authkey=self._auth)
@@ -154,9 +214,18 @@ class SubprocessBase(object):
         return True
     #end def
     
-    def _report_to_server(self):
+    def _send(self, message):
+        '''Send a message to the server while the job is running'''
         if self._con is None: return
-        self._con.send(None)
+        with self._send_lock:
+            try: self._con.send(message)
+            except IOError: pass #the server has gone
+    #end def
+    
+    def _report_to_server(self, result):
+        if self._con is None: return
+        try: self._con.send(Messages.job_done(result))
+        except IOError: pass #the server has gone
     #end def
     
     def _disconnect(self):
@@ -173,6 +242,42 @@ class SubprocessBase(object):
     def _do_work(self, data): pass
 
     
+    def _run_job(self, job):
+        #job is a (working directory, data[, settings]) tuple
+        cwd, data = job[:2]
+        self._settings = job[2] if len(job) > 2 else dict()
+        #reset abort state left by the previous job
+        self._abort_event.clear()
+        #start abort signal listener
+        abort_listner = SignalListener(self._con, self._abort_event)
+        abort_listner.start()
+        #do the work, report back
+        try: 
+            if cwd: os.chdir(cwd)
+            result = self._do_work(data)
+        except Exception:
+            print 'Unhandled exception:'
+            traceback.print_exc()
+            result = 1
+        self._report_to_server(result)
+        #join abort listener
+        abort_listner.join()
+        return result
+    #end def
+    
+    def _serve(self):
+        #receive jobs until shutdown signal or connection loss
+        while True:
+            try: job = self._con.recv()
+            except (EOFError, IOError): break
+            if job is None: break
+            #a late abort signal or anything else that is not a job
+            if not isinstance(job, tuple) or len(job) < 2: continue
+            self._run_job(job)
+            clean_tmp_files()
+        return 0
+    #end def
+    
     def _main(self):
         #check if run from a tty
         if self._check_tty(): return 1 
@@ -191,15 +296,8 @@ class SubprocessBase(object):
         self._get_auth_key()
         #try to connect and get data
         if not self._connect(): return 3
-        data = self._con.recv()
-        #start abort signal listener
-        abort_listner = SignalListener(self._con, self._abort_event)
-        abort_listner.start()
-        #do the work, report back
-        result = self._do_work(data)
-        self._report_to_server()
-        #join abort listener
-        abort_listner.join()
+        if self._persistent: result = self._serve()
+        else: result = self._run_job(self._con.recv())
         #close connection
         self._disconnect()
         return 0 if result == 0 else 3+result
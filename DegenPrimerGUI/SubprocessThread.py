@@ -21,50 +21,16 @@ Created on Nov 10, 2013
 @author: Allis Tauri <allista@gmail.com>
 '''
 
-import os
-import sys
-import errno
-import socket
-import subprocess
-import binascii
-import multiprocessing.connection as mpc
-from time import sleep, time
+from time import time
 from datetime import timedelta
-from PyQt4.QtCore import QThread, pyqtSlot, pyqtSignal, QString, QTimer
+from PyQt4.QtCore import QThread, pyqtSlot, pyqtSignal, QTimer
+from .SubprocessWorker import SubprocessWorker
 
 
-class StreamReader(QThread):
-    '''Non-blocking continuous reading from a file-like object'''
-    message_received = pyqtSignal(str)
-    
-    def __init__(self, _stream):
-        QThread.__init__(self)
-        self._stream = _stream
-        self._abort  = False
-    #end def
-    
-    def _read_and_send(self):
-        if not self._stream: return False
-        msg = self._stream.readline().decode('UTF-8')
-        if not msg: return False
-        self.message_received.emit(QString.fromUtf8(msg))
-        return True
-    #end def
-    
-    def run(self):
-        #read messages and send them as QStrings
-        while not self._abort: self._read_and_send()
-        #send last messages
-        while self._read_and_send(): pass
-    #end def
-
-    @pyqtSlot()
-    def stop(self): self._abort = True
-#end class
-
-
-class SubprocessThread(QThread):
-    '''Wrapper for subprocess with multi-threading'''
+class SubprocessThread(QThread, SubprocessWorker):
+    '''Wrapper for subprocess with multi-threading.
+    The subprocess is driven by SubprocessWorker in this thread; 
+    its output and messages are passed to the main thread as signals.'''
     
     #signals for the main thread
     started          = pyqtSignal()
@@ -72,19 +38,18 @@ class SubprocessThread(QThread):
     update_timer     = pyqtSignal(str)
     results_received = pyqtSignal(object)
     message_received = pyqtSignal(str)
+    #typed messages from the subprocess
+    progress         = pyqtSignal(str, float, str)
+    stage_started    = pyqtSignal(str)
+    stage_finished   = pyqtSignal(str, bool)
+    report_ready     = pyqtSignal(str, str)
+    profile_received = pyqtSignal(object, str)
+    metrics_received = pyqtSignal(object, str)
     
     
-    def __init__(self, module):
+    def __init__(self, module, persistent=False, transport=SubprocessWorker.SOCKETPAIR):
         QThread.__init__(self)
-        self._data       = None
-        self._executable = module.__file__
-        self._subprocess = None
-        self._abort      = False
-        self._auth       = None
-        self._port       = 10000
-        self._readers    = []
-        self._listener   = None
-        self._connection = None
+        SubprocessWorker.__init__(self, module, persistent, transport)
         #timer
         self._timer = QTimer(self)
         self._timer.setInterval(1000)
@@ -94,8 +59,9 @@ class SubprocessThread(QThread):
     #end def
         
     def __del__(self): 
-        self._cleanup()
+        self._abort_subprocess()
         self.wait()
+        self._stop_worker()
     
     @pyqtSlot()
     def _update_timer_string(self):
@@ -106,147 +72,48 @@ class SubprocessThread(QThread):
     @pyqtSlot(str)
     def _on_error(self, msg): self.stop()
     
-    def _stop_readers(self):
-        for reader in self._readers: 
-            reader.stop()
-            reader.wait()
-        self._readers = []
-    #end def
+    def _output(self, text): self.message_received.emit(text)
     
-    def _abort_subprocess(self):
-        if self._abort or self._connection is None: return
-        try: self._connection.send('ABORT')
-        except IOError: pass 
-        self._abort = True
-    #end def
+    def _results(self, data): self.results_received.emit(data)
     
-    def _cleanup(self, e=None):
-        if isinstance(e, Exception): print str(e)
-        if self._listener is not None:
-            self._listener.close()
-            self._listener = None
-        if self._subprocess is not None:
-            self._abort_subprocess()
-            self._subprocess.wait()
-            self._subprocess = None
-        if self._connection is not None:
-            self._connection.close()
-            self._connection = None
-        self._stop_readers()
-        self._timer.stop() 
-        self._auth = None
-        self.finished.emit(e is None)
-    #end def
+    def _progress(self, stage, fraction, text): 
+        self.progress.emit(stage, fraction, text)
     
-    def _setup_listener(self):
-        self._auth = binascii.b2a_hex(os.urandom(32))
-        while not self._abort:
-            try:
-                self._listener = mpc.Listener(('localhost', self._port), 
-                                              authkey=self._auth)
-                return True
-            except socket.error, e:
-                if e.errno in (errno.EADDRINUSE,
-                               errno.EACCES):
-                    self._port += 1
-                    continue
-                print '\nException has occurred while executing %s. Please, try again.' % self._executable
-                self._cleanup(e)
-                return False
-    #end def
+    def _stage_started(self, stage): self.stage_started.emit(stage)
     
-    def _listen(self):
-        while not self._abort:
-            try: 
-                self._connection = self._listener.accept()
-                return True
-            except IOError, e:
-                if e.errno == errno.EINTR:
-                    print str(e)
-                    sleep(0.1)
-                    continue
-                self._cleanup(e)
-                return False
-            except Exception, e:
-                self._cleanup(e)
-                return False
-        self._cleanup()
-        return False
-    #end def
+    def _stage_finished(self, stage, success): 
+        self.stage_finished.emit(stage, success)
     
-    def _run_subprocess(self):
-        try: 
-            self._subprocess = subprocess.Popen((sys.executable, '-u', #unbuffered I/O
-                                                 self._executable,
-                                                 str(self._port)),
-                                                stdin=subprocess.PIPE,
-                                                stdout=subprocess.PIPE,
-                                                stderr=subprocess.PIPE)
-            self._subprocess.stdin.write(self._auth+'\n')
-        except Exception, e:
-            print '\nFaild to execute %s.' % self._executable
-            self._cleanup(e)
-            return False
-        return self._subprocess is not None
-    #end def
+    def _report_ready(self, name, filename): 
+        self.report_ready.emit(name, filename)
     
-    def _receive_results(self):
-        while not self._abort:
-            try:
-                results = self._connection.recv()
-                if results is None: #exchange closing signals
-                    self._connection.send(None)
-                    return True 
-                self.results_received.emit(results)
-            except IOError: pass
-            except EOFError: pass
-            except Exception, e:
-                self._cleanup(e)
-                return False
-        self._cleanup()
-        return False
-    #end def
+    def _profile(self, rows, filename): 
+        self.profile_received.emit(rows, filename)
     
-    def set_data(self, data): self._data = data
+    def _metrics(self, metrics, filename): 
+        self.metrics_received.emit(metrics, filename)
+    
+    def _finish_job(self, success=True):
+        SubprocessWorker._finish_job(self, success)
+        self._timer.stop()
+        self.finished.emit(success)
+    #end def
     
     def run(self):
         self.started.emit()
         self._time0     = time()
-        self._abort = False
         self._update_timer_string()
         self._timer.start()
-        #open connection to listen to the subprocess
-        if not self._setup_listener(): return
-        #run subprocess
-        if not self._run_subprocess(): return
-        #setup stream readers
-        self._readers.append(StreamReader(self._subprocess.stderr))
-        self._readers[-1].message_received.connect(self.message_received)
-#        self._readers[-1].message_received.connect(self._on_error)
-        self._readers[-1].start()
-        self._readers.append(StreamReader(self._subprocess.stdout))
-        self._readers[-1].message_received.connect(self.message_received)
-        self._readers[-1].start()
-        #accept connection
-        if not self._listen(): return
-        #send data to the subprocess
-        self._connection.send(self._data)
-        #receive results
-        if not self._receive_results(): return
-        #wait for the process to exit
-        if self._subprocess and self._subprocess.wait() != 0:
-            print ('\nSubprocess\n   %s\n   exited with exit code %d\n' %
-                   (self._executable, self._subprocess.returncode))
-            self._cleanup(1)
-            return
-        #close the listener and stop readers
-        self._cleanup()        
-        return
+        self._execute()
     #end def
     
     @pyqtSlot()
-    def stop(self):
-        if not self._abort: print '\nAbortintg...\n'
-        self._abort_subprocess() 
+    def stop(self): SubprocessWorker.stop(self)
+    
+    @pyqtSlot()
+    def shutdown(self):
+        '''Stop the persistent worker, if any'''
+        self.wait()
+        self._stop_worker()
     #end def
-#end class
\ No newline at end of file
+#end class
@@ -0,0 +1,377 @@
+# coding=utf-8
+#
+# Copyright (C) 2013 Allis Tauri <allista@gmail.com>
+# 
+# DegenPrimerGUI is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# DegenPrimerGUI is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Created on Oct 18, 2026
+
+@author: Allis Tauri <allista@gmail.com>
+'''
+
+import os
+import sys
+import errno
+import fcntl
+import socket
+import subprocess
+import binascii
+import threading
+import multiprocessing.connection as mpc
+from _multiprocessing import Connection
+from time import sleep
+from .Dispatcher import Dispatcher
+from . import Messages
+
+
+class SubprocessWorker(object):
+    '''Runs jobs in a subprocess built on SubprocessBase.
+    If persistent is True the subprocess is started once and then reused 
+    for every subsequent job; it is restarted only if it has crashed.
+    The subprocess is connected through an inherited unix socketpair; 
+    with transport='tcp', or if a socketpair cannot be created, it 
+    connects to a localhost TCP listener instead.
+    Results and output of the subprocess are all handled in the calling 
+    thread by a single poll()-based Dispatcher and passed to the handler
+    methods below, which subclasses override. No Qt is needed here.'''
+    
+    SOCKETPAIR = 'socketpair'
+    TCP        = 'tcp'
+    
+    #the child end of a socketpair is inheritable until the subprocess 
+    #has started; workers in other threads must not spawn meanwhile
+    _spawn_lock = threading.Lock()
+    
+    def __init__(self, module, persistent=False, transport=SOCKETPAIR):
+        '''module is the subprocess module or the path to its file'''
+        self._data       = None
+        self._cwd        = None
+        self._settings   = None
+        self._executable = module if isinstance(module, basestring) else module.__file__
+        self._persistent = persistent
+        self._transport  = transport
+        self._child_sock = None
+        self._subprocess = None
+        self._abort      = False
+        self._auth       = None
+        self._port       = 10000
+        self._listener   = None
+        self._connection = None
+        self._dispatcher = None
+        #no job is running; ABORT is only sent while one is
+        self._job_done   = True
+        self._job_result = None
+        self._send_lock  = threading.Lock()
+        self._lost       = False
+        self.success     = False
+    #end def
+    
+    #handlers of the subprocess output and messages
+    def _output(self, text): sys.stdout.write(text)
+    
+    def _results(self, data): pass
+    
+    def _progress(self, stage, fraction, text): pass
+    
+    def _stage_started(self, stage): pass
+    
+    def _stage_finished(self, stage, success): pass
+    
+    def _report_ready(self, name, filename): pass
+    
+    def _profile(self, rows, filename): pass
+    
+    def _metrics(self, metrics, filename): pass
+    
+    
+    def _abort_subprocess(self):
+        if self._abort: return
+        self._abort = True
+        #after the end-of-job handshake the persistent subprocess
+        #would take the signal for the next job
+        with self._send_lock:
+            if self._job_done or self._connection is None: return
+            try: self._connection.send('ABORT')
+            except IOError: pass
+    #end def
+    
+    def _worker_alive(self):
+        return (self._subprocess is not None 
+                and self._subprocess.poll() is None
+                and self._connection is not None)
+    #end def
+    
+    def _stop_worker(self):
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+        #ask an idle worker to exit; a busy one gets EOF when it is done
+        if self._connection is not None:
+            try: self._connection.send(None)
+            except IOError: pass
+            self._connection.close()
+            self._connection = None
+        if self._child_sock is not None:
+            self._child_sock.close()
+            self._child_sock = None
+        if self._subprocess is not None:
+            self._subprocess.wait()
+        #pass on the last output of the subprocess
+        if self._dispatcher is not None:
+            self._dispatcher.drain()
+            self._dispatcher.clear()
+            self._dispatcher = None
+        self._subprocess = None
+        self._auth = None
+        self._job_done = True
+    #end def
+    
+    def _finish_job(self, success=True):
+        self.success = success
+    
+    def _cleanup(self, e=None):
+        if isinstance(e, Exception): print str(e)
+        if e is not None: self._abort_subprocess()
+        self._stop_worker()
+        self._finish_job(e is None)
+    #end def
+    
+    def _setup_socketpair(self):
+        try: parent_sock, self._child_sock = socket.socketpair()
+        except (AttributeError, socket.error), e:
+            print '\nUnable to create a socketpair, falling back to TCP:\n%s' % str(e)
+            return False
+        #only the child end should be inherited by the subprocess
+        fd = os.dup(parent_sock.fileno())
+        fcntl.fcntl(fd, fcntl.F_SETFD, fcntl.fcntl(fd, fcntl.F_GETFD) | fcntl.FD_CLOEXEC)
+        parent_sock.close()
+        self._connection = Connection(fd)
+        return True
+    #end def
+    
+    def _handshake(self):
+        #the same mutual authentication that Listener.accept performs
+        try:
+            mpc.deliver_challenge(self._connection, self._auth)
+            mpc.answer_challenge(self._connection, self._auth)
+        except (mpc.AuthenticationError, EOFError, IOError), e:
+            self._cleanup(e)
+            return False
+        return True
+    #end def
+    
+    def _setup_listener(self):
+        while not self._abort:
+            try:
+                self._listener = mpc.Listener(('localhost', self._port), 
+                                              authkey=self._auth)
+                return True
+            except socket.error, e:
+                if e.errno in (errno.EADDRINUSE,
+                               errno.EACCES):
+                    self._port += 1
+                    continue
+                print '\nException has occurred while executing %s. Please, try again.' % self._executable
+                self._cleanup(e)
+                return False
+    #end def
+    
+    def _listen(self):
+        while not self._abort:
+            try: 
+                self._connection = self._listener.accept()
+                return True
+            except IOError, e:
+                if e.errno == errno.EINTR:
+                    print str(e)
+                    sleep(0.1)
+                    continue
+                self._cleanup(e)
+                return False
+            except Exception, e:
+                self._cleanup(e)
+                return False
+        self._cleanup()
+        return False
+    #end def
+    
+    def _run_subprocess(self):
+        args = [sys.executable, '-u', #unbuffered I/O
+                self._executable]
+        if self._child_sock is not None:
+            args += ['--fd', str(self._child_sock.fileno())]
+        else: args.append(str(self._port))
+        if self._persistent: args.append('--persistent')
+        try: 
+            self._subprocess = subprocess.Popen(args,
+                                                stdin=subprocess.PIPE,
+                                                stdout=subprocess.PIPE,
+                                                stderr=subprocess.PIPE)
+            self._subprocess.stdin.write(self._auth+'\n')
+        except Exception, e:
+            print '\nFaild to execute %s.' % self._executable
+            self._cleanup(e)
+            return False
+        #the subprocess holds its own copy of the child end now
+        if self._child_sock is not None:
+            self._child_sock.close()
+            self._child_sock = None
+        return self._subprocess is not None
+    #end def
+    
+    def _start_worker(self):
+        self._auth = binascii.b2a_hex(os.urandom(32))
+        #create a socketpair or open connection to listen to the subprocess
+        with self._spawn_lock:
+            use_pair = (self._transport == self.SOCKETPAIR 
+                        and self._setup_socketpair())
+            if not use_pair and not self._setup_listener(): return False
+            #run subprocess
+            if not self._run_subprocess(): return False
+        #watch output streams
+        self._dispatcher = Dispatcher()
+        self._dispatcher.add_stream(self._subprocess.stderr, self._output)
+        self._dispatcher.add_stream(self._subprocess.stdout, self._output)
+        if use_pair: 
+            #authenticate through the socketpair
+            if not self._handshake(): return False
+        else:
+            #accept connection
+            if not self._listen(): return False
+            #the listener is not needed after the worker has connected
+            self._listener.close()
+            self._listener = None
+        #watch the connection
+        self._lost = False
+        self._dispatcher.add_connection(self._connection, self._on_recv, 
+                                        self._on_connection_lost)
+        return True
+    #end def
+    
+    def _on_recv(self, msg):
+        if Messages.is_message(msg) and msg[0] == Messages.JOB_DONE:
+            #exchange closing signals
+            #the output of the job is in the pipes already; 
+            #pass it on before the next job starts
+            self._dispatcher.drain()
+            with self._send_lock:
+                self._connection.send(None)
+                self._job_result = msg[1]['result']
+                self._job_done   = True
+        else: self._dispatch(msg)
+    #end def
+    
+    def _on_connection_lost(self): self._lost = True
+    
+    def _dispatch(self, msg):
+        #untyped objects are passed on as results
+        if not Messages.is_message(msg):
+            self._results(msg)
+            return
+        kind, payload = msg
+        if kind == Messages.RESULTS:
+            self._results(payload['data'])
+        elif kind == Messages.PROGRESS:
+            self._progress(payload['stage'], payload['fraction'], 
+                           payload.get('text', ''))
+        elif kind == Messages.STAGE_STARTED:
+            self._stage_started(payload['stage'])
+        elif kind == Messages.STAGE_FINISHED:
+            self._stage_finished(payload['stage'], payload['success'])
+        elif kind == Messages.REPORT_READY:
+            self._report_ready(payload['name'], payload['filename'])
+        elif kind == Messages.PROFILE:
+            self._profile(payload['rows'], payload['filename'])
+        elif kind == Messages.METRICS:
+            self._metrics(payload['data'], payload['filename'])
+    #end def
+    
+    def _receive_results(self):
+        #after an abort the worker still finishes the job and reports back
+        while not self._job_done:
+            if self._lost:
+                print ('\nSubprocess\n   %s\n   has terminated unexpectedly\n' 
+                       % self._executable)
+                self._cleanup(1)
+                return False
+            try: self._dispatcher.poll()
+            except Exception, e:
+                self._cleanup(e)
+                return False
+        return True
+    #end def
+    
+    def set_data(self, data, cwd=None, settings=None): 
+        '''settings is a dict of job settings that are not 
+        part of the data, e.g. {'profile': True}'''
+        self._data     = data
+        self._cwd      = cwd
+        self._settings = settings
+    #end def
+    
+    def _execute(self):
+        '''Run the current job; the outcome is passed to _finish_job'''
+        self._abort = False
+        #start a new worker or restart a crashed one
+        if not self._worker_alive():
+            self._stop_worker()
+            if not self._start_worker(): return
+        #send the job to the subprocess
+        job = (self._cwd or os.getcwd(), self._data)
+        if self._settings: job += (self._settings,)
+        with self._send_lock:
+            try: 
+                self._connection.send(job)
+                self._job_done   = False
+                self._job_result = None
+                #the job was aborted before it was sent
+                if self._abort: self._connection.send('ABORT')
+            except IOError, e: error = e
+            else: error = None
+        if error is not None:
+            self._cleanup(error)
+            return
+        #receive results
+        if not self._receive_results(): return
+        #keep the persistent worker for the next job
+        if self._persistent:
+            self._finish_job(self._job_result == 0)
+            return
+        #wait for the process to exit
+        if self._subprocess and self._subprocess.wait() != 0:
+            print ('\nSubprocess\n   %s\n   exited with exit code %d\n' %
+                   (self._executable, self._subprocess.returncode))
+            self._cleanup(1)
+            return
+        #close the connection and stop watching the streams
+        self._cleanup()        
+    #end def
+    
+    def run_job(self, data, cwd=None, settings=None):
+        '''Run a job in the calling thread; returns True on success'''
+        self.set_data(data, cwd, settings)
+        self._execute()
+        return self.success
+    #end def
+    
+    def stop(self):
+        if not self._abort: print '\nAbortintg...\n'
+        self._abort_subprocess() 
+    #end def
+    
+    def shutdown(self):
+        '''Stop the persistent worker, if any'''
+        self._stop_worker()
+#end class
@@ -0,0 +1,195 @@
+# coding=utf-8
+#
+# Copyright (C) 2013 Allis Tauri <allista@gmail.com>
+#
+# DegenPrimerGUI is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# DegenPrimerGUI is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Created on Oct 18, 2026
+
+Resource usage of a job: CPU time, peak resident memory, I/O and worker
+processes of a subprocess and all of its children, from getrusage() and
+/proc. Like Messages, this module is imported both by the subprocess and 
+by the GUI, so the metrics are a plain dict.
+
+@author: Allis Tauri <allista@gmail.com>
+'''
+
+import os
+import resource
+from time import time, strftime, localtime
+from threading import Thread, Event
+
+
+#metric names in the order they are shown and saved
+METRICS = ('wall_time', 'user_time', 'system_time', 'peak_rss', 
+           'peak_tree_rss', 'read_bytes', 'write_bytes', 'rchar', 'wchar', 
+           'processes', 'max_processes')
+
+_page_size = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def _read_io(pid='self'):
+    '''Counters from /proc/<pid>/io; reaped children are included'''
+    io = dict()
+    try:
+        with open('/proc/%s/io' % pid) as inp:
+            for line in inp:
+                key, value = line.split(':')
+                io[key] = int(value)
+    except (IOError, ValueError): pass
+    return io
+#end def
+
+def _read_hwm():
+    '''Peak resident set size of this process in bytes'''
+    try:
+        with open('/proc/self/status') as inp:
+            for line in inp:
+                if line.startswith('VmHWM:'): return int(line.split()[1])*1024
+    except (IOError, ValueError): pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss*1024
+#end def
+
+def _reset_hwm():
+    '''Reset the peak RSS of this process (Linux >= 4.0)'''
+    try:
+        with open('/proc/self/clear_refs', 'w') as out: out.write('5')
+    except IOError: pass
+#end def
+
+def _process_tree(root):
+    '''{pid: rss in bytes} of the root process and all its descendants'''
+    parents = dict(); rss = dict()
+    try: pids = [int(pid) for pid in os.listdir('/proc') if pid.isdigit()]
+    except OSError: return {root: 0}
+    for pid in pids:
+        try:
+            with open('/proc/%d/stat' % pid) as inp: stat = inp.read()
+        except IOError: continue
+        #the command name may contain spaces, so split after it
+        fields = stat[stat.rfind(')')+2:].split()
+        parents[pid] = int(fields[1])
+        rss[pid]     = int(fields[21])*_page_size
+    tree = {root: rss.get(root, 0)}
+    added = True
+    while added:
+        added = False
+        for pid, ppid in parents.iteritems():
+            if ppid in tree and pid not in tree:
+                tree[pid] = rss[pid]
+                added = True
+    return tree
+#end def
+
+
+class ResourceMonitor(Thread):
+    '''Measures resources used by this process and its children between
+    start() and stop(). The process tree is sampled every interval seconds
+    to count worker processes and find the peak memory of the whole tree.'''
+    
+    def __init__(self, interval=0.5):
+        Thread.__init__(self)
+        self.daemon    = True
+        self._interval = interval
+        self._pid      = os.getpid()
+        self._stopped  = Event()
+        self._seen     = set()
+        self._max_proc = 0
+        self._peak     = 0
+        self._start    = None
+    #end def
+    
+    @staticmethod
+    def _usage():
+        own      = resource.getrusage(resource.RUSAGE_SELF)
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return (time(), own.ru_utime+children.ru_utime, 
+                own.ru_stime+children.ru_stime, _read_io())
+    #end def
+    
+    def _sample(self):
+        tree = _process_tree(self._pid)
+        self._seen.update(tree)
+        self._max_proc = max(self._max_proc, len(tree)-1)
+        self._peak     = max(self._peak, sum(tree.itervalues()))
+    #end def
+    
+    def start(self):
+        _reset_hwm()
+        self._start = self._usage()
+        Thread.start(self)
+    #end def
+    
+    def run(self):
+        while not self._stopped.is_set():
+            self._sample()
+            self._stopped.wait(self._interval)
+    #end def
+    
+    def stop(self):
+        '''Stop monitoring and return the metrics'''
+        self._stopped.set()
+        self.join()
+        self._sample()
+        wall, utime, stime, io = self._usage()
+        wall0, utime0, stime0, io0 = self._start
+        metrics = dict(wall_time   = wall-wall0,
+                       user_time   = utime-utime0,
+                       system_time = stime-stime0,
+                       peak_rss    = _read_hwm(),
+                       processes   = len(self._seen)-1,
+                       max_processes = self._max_proc)
+        metrics['peak_tree_rss'] = max(self._peak, metrics['peak_rss'])
+        for key in ('read_bytes', 'write_bytes', 'rchar', 'wchar'):
+            metrics[key] = io.get(key, 0)-io0.get(key, 0)
+        return metrics
+    #end def
+#end class
+
+
+def _size(value):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(value) < 1024: return '%.1f %s' % (value, unit)
+        value /= 1024.0
+    return '%.1f TB' % value
+#end def
+
+def format_metrics(metrics):
+    '''Human readable multi-line summary'''
+    lines = ['Wall time:      %.2f s' % metrics['wall_time'],
+             'CPU time:       %.2f s user, %.2f s system' 
+             % (metrics['user_time'], metrics['system_time']),
+             'Peak memory:    %s (all processes: %s)' 
+             % (_size(metrics['peak_rss']), _size(metrics['peak_tree_rss'])),
+             'Disk I/O:       %s read, %s written' 
+             % (_size(metrics['read_bytes']), _size(metrics['write_bytes'])),
+             'Total I/O:      %s read, %s written' 
+             % (_size(metrics['rchar']), _size(metrics['wchar'])),
+             'Worker processes: %d (at most %d at a time)' 
+             % (metrics['processes'], metrics['max_processes'])]
+    return '\n'.join(lines)
+#end def
+
+def append_metrics(filename, metrics, **extra):
+    '''Append the metrics as a tab-separated line; 
+    the header is written to a new file'''
+    columns = ['time']+sorted(extra)+list(METRICS)
+    values  = dict(extra, time=strftime('%Y-%m-%d %H:%M:%S', localtime()))
+    values.update(metrics)
+    new = not os.path.isfile(filename)
+    with open(filename, 'a') as out:
+        if new: out.write('\t'.join(columns)+'\n')
+        out.write('\t'.join(str(values.get(col, '')) for col in columns)+'\n')
+#end def
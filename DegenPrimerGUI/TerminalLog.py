@@ -0,0 +1,144 @@
+# coding=utf-8
+#
+# Copyright (C) 2013 Allis Tauri <allista@gmail.com>
+#
+# DegenPrimerGUI is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# DegenPrimerGUI is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Created on Oct 18, 2026
+
+@author: Allis Tauri <allista@gmail.com>
+'''
+
+import os
+
+
+class RotatingLog(object):
+    '''Append-only text log split into files of limited size: filename,
+    filename.1, ... filename.N, the oldest being removed on rotation.
+    Positions are absolute byte offsets in the whole written stream,
+    so lines can be read back across the rotated files.'''
+
+    _block = 1<<16
+
+    def __init__(self, filename, max_bytes=1<<22, backups=4, encoding='UTF-8'):
+        self.filename  = filename
+        self._max      = max_bytes
+        self._backups  = backups
+        self._encoding = encoding
+        #absolute start positions of filename, filename.1, ...
+        self._starts   = [0]
+        self._size     = 0
+        self._file     = open(filename, 'wb')
+    #end def
+
+    def __del__(self): self.close()
+
+    def close(self):
+        if self._file is None: return
+        self._file.close()
+        self._file = None
+    #end def
+
+    def remove(self):
+        '''Close the log and delete all of its files'''
+        self.close()
+        for i in xrange(len(self._starts)):
+            try: os.remove(self._path(i))
+            except OSError: pass
+    #end def
+
+    @property
+    def begin(self): return self._starts[-1]
+
+    @property
+    def end(self): return self._starts[0]+self._size
+
+    def _path(self, i):
+        return self.filename if i == 0 else '%s.%d' % (self.filename, i)
+
+    def _rotate(self):
+        self._file.close()
+        self._starts.insert(0, self.end)
+        for i in xrange(len(self._starts)-2, -1, -1):
+            if i+1 > self._backups: os.remove(self._path(i))
+            else: os.rename(self._path(i), self._path(i+1))
+        del self._starts[self._backups+1:]
+        self._file = open(self.filename, 'wb')
+        self._size = 0
+    #end def
+
+    def write(self, text):
+        if self._file is None: return
+        data = unicode(text).encode(self._encoding)
+        if self._size and self._size+len(data) > self._max: self._rotate()
+        self._file.write(data)
+        self._file.flush()
+        self._size += len(data)
+    #end def
+
+    def _read(self, start, end):
+        '''Raw bytes between two absolute positions'''
+        start = max(start, self.begin); end = min(end, self.end)
+        chunks = []
+        for i in xrange(len(self._starts)-1, -1, -1):
+            seg_start = self._starts[i]
+            seg_end   = self._starts[i-1] if i > 0 else self.end
+            if seg_end <= start or seg_start >= end: continue
+            with open(self._path(i), 'rb') as inp:
+                inp.seek(max(start, seg_start)-seg_start)
+                chunks.append(inp.read(min(end, seg_end)-max(start, seg_start)))
+        return ''.join(chunks)
+    #end def
+
+    def _decode(self, lines):
+        return [line.decode(self._encoding, 'replace') for line in lines]
+
+    def read_before(self, pos, nlines):
+        '''Up to nlines lines that end before pos.
+        Returns (lines, absolute position of the first line).'''
+        data = ''; start = pos
+        while start > self.begin and data.count('\n') <= nlines:
+            end   = start
+            start = max(self.begin, end-self._block)
+            data  = self._read(start, end)+data
+        lines = data.split('\n')
+        if lines and not lines[-1]: lines.pop()
+        #the first line may be cut by the block boundary
+        if start > self.begin and lines:
+            start += len(lines.pop(0))+1
+        if len(lines) > nlines:
+            for line in lines[:-nlines]: start += len(line)+1
+            lines = lines[-nlines:]
+        return self._decode(lines), start
+    #end def
+
+    def read_after(self, pos, nlines):
+        '''Up to nlines lines that start at pos.
+        Returns (lines, absolute position after the last line).'''
+        pos  = max(pos, self.begin)
+        data = ''; end = pos
+        while end < self.end and data.count('\n') < nlines:
+            start = end
+            end   = min(self.end, start+self._block)
+            data += self._read(start, end)
+        lines = data.split('\n')
+        #the last line is either incomplete or empty
+        tail  = lines.pop()
+        if len(lines) > nlines: lines = lines[:nlines]
+        elif end >= self.end and tail: lines.append(tail)
+        end = pos+sum(len(line)+1 for line in lines)
+        return self._decode(lines), min(end, self.end)
+    #end def
+#end class
@@ -0,0 +1,93 @@
+# coding=utf-8
+#
+# Copyright (C) 2013 Allis Tauri <allista@gmail.com>
+#
+# DegenPrimerGUI is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# DegenPrimerGUI is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Created on Oct 18, 2026
+
+Form classes of the .ui files. setup.py compiles the forms with pyuic4 
+into <name>_ui.py modules of this package; when running from source 
+the .ui file is compiled once per process and the form class is cached.
+Either way uic is not used to parse XML every time a widget is created.
+
+@author: Allis Tauri <allista@gmail.com>
+'''
+
+import os
+import re
+from StringIO import StringIO
+
+#process-wide cache: ui file name -> form class
+_forms = dict()
+
+#resources are imported by the GUI module itself
+_resource_import = re.compile(r'^\s*import \w+_rc\s*$', re.M)
+
+
+def module_name(ui_file):
+    '''Name of the module compiled from the ui_file'''
+    return os.path.splitext(os.path.basename(ui_file))[0]+'_ui'
+
+def _form_class(namespace):
+    for name, obj in namespace.iteritems():
+        if name.startswith('Ui_') and isinstance(obj, type): return obj
+    return None
+#end def
+
+def _precompiled(ui_file):
+    package = __name__.rpartition('.')[0]
+    try: module = __import__('%s.%s' % (package, module_name(ui_file)), fromlist=['*'])
+    except ImportError: return None
+    return _form_class(vars(module))
+#end def
+
+def compile_form(filepath):
+    '''Compile the .ui file into a form class without loading a module'''
+    from PyQt4 import uic
+    code = StringIO()
+    with open(filepath) as ui:
+        uic.compileUi(ui, code)
+    code = _resource_import.sub('', code.getvalue())
+    namespace = {'__name__': module_name(filepath)}
+    exec compile(code, filepath, 'exec') in namespace
+    return _form_class(namespace)
+#end def
+
+def form_class(ui_file, search_path):
+    '''Form class of the ui_file: a precompiled one or the one compiled
+    from the first ui_file found in the search_path'''
+    form = _forms.get(ui_file)
+    if form is not None: return form
+    form = _precompiled(ui_file)
+    if form is None:
+        for path in search_path:
+            filepath = os.path.join(path, ui_file)
+            if os.path.isfile(filepath):
+                form = compile_form(filepath)
+                break
+        else: raise OSError('Error: unable to locate %s.' % ui_file)
+    _forms[ui_file] = form
+    return form
+#end def
+
+def setup_ui(ui_file, widget, search_path):
+    '''Build the form on the widget. As with uic.loadUi, the child 
+    widgets become attributes of the widget itself.'''
+    form = form_class(ui_file, search_path)()
+    form.setupUi(widget)
+    for name, child in vars(form).iteritems():
+        setattr(widget, name, child)
+#end def
@@ -18,18 +18,38 @@ Created on Mar 23, 2013
 @author: Allis Tauri <allista@gmail.com>
 '''
 
+import re
+import codecs
+from time import time
+from array import array
+from bisect import bisect_left
+from datetime import timedelta
+from Queue import Queue, Empty, Full
+from multiprocessing import cpu_count, TimeoutError
 from PyQt4.QtCore import Qt, QString, QSettings, pyqtSlot, pyqtSignal, QThread, \
-QAbstractTableModel, QModelIndex, QVariant
+QAbstractTableModel, QModelIndex, QVariant, QTimer, QObject
 from PyQt4.QtGui import QLineEdit, QTableWidget, QTableWidgetItem,  \
-QAbstractItemView, QFileDialog, QTableView
+QAbstractItemView, QFileDialog, QTableView, QPushButton, QHeaderView, \
+QTreeWidget, QTreeWidgetItem, QAbstractScrollArea, QPainter, QFont, \
+QPalette, QColor, QWidget, QLabel, QGridLayout, QItemSelection, \
+QItemSelectionModel, QApplication
 
-from BioUtils.SeqUtils import SeqView, pretty_rec_name
+from .Telemetry import format_metrics
+from .LineIndex import LineIndex
+from .SequenceIndex import SequenceIndex, RowSelection, IndexCache, index_file, index_pool
 
 class PolyLineEdit(QLineEdit):
     '''Wrapper for QLineEdit which overloads setText 
-    to make it accept list of strings'''
+    to make it accept list of strings. Items may also be added and 
+    removed with change_items, which keeps them parsed between changes.'''
     def __init__(self, parent):
         QLineEdit.__init__(self, parent)
+        #parsed items with None in place of removed ones and their positions
+        self._items     = None
+        self._positions = None
+        self._changing  = False
+        self.textChanged.connect(self._drop_items)
+    #end def
     
     @pyqtSlot('QStringList')
     def setText(self, strings):
@@ -41,6 +61,37 @@ class PolyLineEdit(QLineEdit):
         text = unicode(QLineEdit.text(self))
         return [it for it in (item.strip() for item in text.split(',')) if it]
     #end def
+    
+    @pyqtSlot('QString')
+    def _drop_items(self, _text):
+        if not self._changing: self._items = self._positions = None
+    
+    @staticmethod
+    def _decode(item):
+        return item.decode('UTF-8') if isinstance(item, str) else item
+    
+    @pyqtSlot(object, object)
+    def change_items(self, added, removed):
+        '''Add and remove items; added ones are appended'''
+        if self._items is None:
+            self._items = self.text()
+            self._positions = dict()
+            for i, item in enumerate(self._items):
+                if self._positions.setdefault(item, i) != i: self._items[i] = None
+        items, positions = self._items, self._positions
+        for item in map(self._decode, removed):
+            i = positions.pop(item, None)
+            if i is not None: items[i] = None
+        for item in map(self._decode, added):
+            if item in positions: continue
+            positions[item] = len(items)
+            items.append(item)
+        self._changing = True
+        try: QLineEdit.setText(self, QString.fromUtf8(u', '.join(filter(None, items))))
+        finally: self._changing = False
+        #parse the text anew rather than keep many removed items
+        if len(items) > 2*len(positions): self._items = self._positions = None
+    #end def
 #end class
 
 
@@ -82,39 +133,46 @@ class FileDialog(QFileDialog):
 
 #adapted from https://sateeshkumarb.wordpress.com/2012/04/01/paginated-display-of-table-data-in-pyqt/
 class SequenceTableModel(QAbstractTableModel):
+    '''Lists IDs and descriptions of the records of a SequenceIndex;
+    descriptions are shown once the index has them and records may be
+    added to the index while the model is shown.
+    Rows of the model are either all the records or only those
+    given to set_filter; database rows are the positions of the
+    records in the SequenceIndex.'''
     
+    #rows fetched at a time; the view sets it from the height of its viewport
     rows_to_load = 10
     
-    select_row = pyqtSignal(int)
-    
-    def __init__(self, db, parent=None):
+    def __init__(self, seq_index, parent=None):
         super(SequenceTableModel, self).__init__(parent)
         self._header = ['ID', 'description']
-        self._db     = db
-        self._rows   = []
-        self._to_select = []
+        self.seq_index = seq_index
+        #the key list and the ID to row map are built once by the index
+        self._keys   = seq_index.ids
+        self._index  = seq_index.rows
+        #sorted database rows shown by the model; None means all
+        self._filter = None
+        self._fetched = 0
         self.fetchMore()
     
+    def size(self):
+        '''Number of rows when all of them are fetched'''
+        return len(self._keys) if self._filter is None else len(self._filter)
+    
     def rowCount(self, index=QModelIndex()):
-        dbl = len(self._db); nrows = len(self._rows)
-        return dbl if dbl < nrows else nrows
+        return min(self.size(), self._fetched)
     
     def canFetchMore(self, index=QModelIndex()):
-        return len(self._db) > len(self._rows)
+        return self.size() > self._fetched
  
     def fetchMore(self, index=QModelIndex()):
-        start = len(self._rows)
-        end = start+min(len(self._db) - start, self.rows_to_load)
+        start = self._fetched
+        end = start+min(self.size() - start, self.rows_to_load)
+        #e.g. a filter without matches
+        if end <= start: return
         self.beginInsertRows(QModelIndex(), start, end-1)
-        self._rows.extend((sid, pretty_rec_name(self._db[sid])) for sid in self._db.keys()[start:end])
+        self._fetched = end
         self.endInsertRows()
-        if self._to_select and start <= self._to_select[0]:
-            selected = 0
-            for row in self._to_select:
-                if row >= end: break
-                self.select_row.emit(row)
-                selected += 1
-            self._to_select = self._to_select[selected:]                
  
     def columnCount(self,index=QModelIndex()):
         return len(self._header)
@@ -122,8 +180,12 @@ class SequenceTableModel(QAbstractTableModel):
     def data(self, index, role=Qt.DisplayRole):
         if role != Qt.DisplayRole: return QVariant() #why?
         col = index.column()
-        row = self._rows[index.row()]
-        return QVariant(row[col]) if col < len(row) else QVariant()
+        db_row = self.db_row(index.row())
+        if col == 0: return QVariant(self._keys[db_row])
+        if col == 1:
+            description = self.seq_index.descriptions[db_row]
+            if description is not None: return QVariant(description)
+        return QVariant()
     
     def headerData(self, section, orientation, role=Qt.DisplayRole):
         if role != Qt.DisplayRole: return QVariant()
@@ -131,45 +193,242 @@ class SequenceTableModel(QAbstractTableModel):
             return QVariant(self._header[section])
         return QVariant(int(section + 1))
     
-    def sid(self, index): return self._db.keys()[index]
+    @property
+    def filtered(self): return self._filter is not None
+    
+    @property
+    def filter_rows(self): return self._filter
+    
+    def set_filter(self, db_rows):
+        '''Show only the given sorted database rows; None shows all'''
+        self.beginResetModel()
+        self._filter  = db_rows
+        self._fetched = 0
+        self.endResetModel()
+        self.fetchMore()
+    #end def
+    
+    def extend_filter(self, db_rows):
+        '''Show also the given sorted database rows that were added
+        to the index after the filter was set'''
+        if self._filter is not None: self._filter.extend(db_rows)
+    #end def
+    
+    def descriptions_changed(self, start, end):
+        '''Descriptions of the database rows [start, end) have changed'''
+        if self._filter is not None:
+            start = bisect_left(self._filter, start)
+            end   = bisect_left(self._filter, end)
+        end = min(end, self.rowCount())
+        if start < end: 
+            self.dataChanged.emit(self.index(start, 1), self.index(end-1, 1))
+    #end def
+    
+    def db_row(self, row):
+        return row if self._filter is None else self._filter[row]
+    
+    def db_rows(self, start, end):
+        '''Database rows shown by the rows [start, end)'''
+        return xrange(start, end) if self._filter is None else self._filter[start:end]
+    
+    def row(self, db_row):
+        '''Row of the model that shows a database row; -1 if it is filtered out'''
+        if self._filter is None: return db_row
+        row = bisect_left(self._filter, db_row)
+        return row if row < len(self._filter) and self._filter[row] == db_row else -1
+    #end def
+    
+    def sid(self, index): return self._keys[self.db_row(index)]
     
     def sindex(self, sid): 
-        try: return self._db.keys().index(sid)
-        except ValueError: return -1
+        db_row = self._index.get(sid)
+        return -1 if db_row is None else self.row(db_row)
         
     def sindexes(self, sids):
-        found = []
-        for i, k in enumerate(self._db.keys()):
-            if len(found) >= len(sids): break
-            if k in sids: found.append(i)
-        return found
-    
-    def to_select(self, rows):
-        self._to_select = rows
+        '''Sorted database rows of the IDs that are in the database'''
+        rows = set(map(self._index.get, sids))
+        rows.discard(None)
+        return sorted(rows)
 
 
 class SequenceTableView(QTableView):
     '''TableWidget that lists content of sequence database and returns IDs of
-    selected sequences'''
+    selected sequences. Records are shown as soon as they are loaded;
+    loading reports its progress with the status signal and stops 
+    at the next record when abort_loading is emitted.
+    The selection is a RowSelection of database rows: each change emits
+    selection_changed with the IDs added and removed. Once changes stop 
+    for send_delay, the IDs added and removed since the last send are sent 
+    with send_changes, or, if there are more than max_changes of them, 
+    the whole list of IDs is sent with send_ids.
+    Rows are fetched a few viewport heights ahead of the visible ones,
+    and the loader is asked to describe the visible records first.'''
+    
+    send_delay = 300 #ms
+    #more changes are sent as the whole list of IDs
+    max_changes = 10000
+    #viewport heights fetched at a time
+    prefetch_pages = 3
     
     send_ids = pyqtSignal(list)
+    #IDs added to and removed from the selection since the last send
+    send_changes = pyqtSignal(object, object)
+    #IDs added to and removed from the selection
+    selection_changed = pyqtSignal(object, object)
     abort_loading = pyqtSignal()
     loaded = pyqtSignal()
+    load_finished = pyqtSignal()
+    filtered = pyqtSignal(int)
+    status = pyqtSignal(str)
     
     class _Loader(QThread):
-        loaded = pyqtSignal()
+        '''Reads IDs of the records of sequence files, then formats
+        their descriptions; both are sent in batches as they are ready.
+        IDs and descriptions are taken from the IndexCache if the files
+        are in it and are stored there otherwise, also when loading is 
+        stopped, so that a stopped load is resumed the next time.
+        If at least parallel_files files are not cached, they are read 
+        by a pool of worker processes instead, each file as a whole;
+        records are still added in the order of the files.
+        The records shown by the view are described first: describe_first
+        may be called from the GUI thread at any time.'''
+        
+        batch = 1000
+        #records described between the checks of describe_first requests
+        first_check = 100
+        parallel_files = 2
+        
+        file_started = pyqtSignal(int, int, str)
+        #ids, descriptions or None
+        records      = pyqtSignal(object, object)
+        #database row of the first record, descriptions
+        described    = pyqtSignal(int, object)
+        
         def __init__(self, filenames):
             QThread.__init__(self)
-            self.db = None
             self.filenames = filenames
+            self.stopped   = False
+            self._first    = Queue()
             
         def __del__(self):
             self.wait()
+        
+        def _send_records(self, ids, descriptions):
+            batch = self.batch*10
+            for i in xrange(0, len(ids), batch):
+                self.records.emit(ids[i:i+batch], 
+                                  None if descriptions is None 
+                                  else descriptions[i:i+batch])
+        #end def
+        
+        def describe_first(self, db_rows):
+            '''Describe the records of these sorted database rows next'''
+            self._first.put(db_rows)
+        
+        def _describe_first(self, view, ids, descriptions, offset):
+            db_rows = None
+            #only the latest request matters
+            while True:
+                try: db_rows = self._first.get_nowait()
+                except Empty: break
+            if not db_rows: return
+            from BioUtils.SeqUtils import pretty_rec_name
+            end  = offset+len(ids)
+            runs = []
+            for i in (row-offset for row in db_rows if offset <= row < end):
+                if descriptions[i] is not None: continue
+                descriptions[i] = pretty_rec_name(view[ids[i]])
+                if runs and runs[-1][1] == i: runs[-1][1] = i+1
+                else: runs.append([i, i+1])
+            for start, stop in runs:
+                self.described.emit(offset+start, descriptions[start:stop])
+        #end def
+        
+        def _describe(self, view, ids, descriptions, offset):
+            '''Fill in unknown descriptions; False if stopped'''
+            #BioUtils is imported by run() in this thread
+            from BioUtils.SeqUtils import pretty_rec_name
+            for start in xrange(0, len(ids), self.batch):
+                end = min(start+self.batch, len(ids))
+                described = False
+                for i in xrange(start, end):
+                    if self.stopped: break
+                    if i % self.first_check == 0:
+                        self._describe_first(view, ids, descriptions, offset)
+                    if descriptions[i] is not None: continue
+                    descriptions[i] = pretty_rec_name(view[ids[i]])
+                    described = True
+                if described: 
+                    self.described.emit(offset+start, descriptions[start:end])
+                if self.stopped: return False
+            return True
+        #end def
+            
+        def _wait(self, results):
+            '''Next result of the pool; None if stopped'''
+            while not self.stopped:
+                try: return results.next(0.1)
+                except TimeoutError: pass
+            return None
+        #end def
             
         def run(self):
-            self.db = SeqView()
-            self.db.load(self.filenames)
-            self.loaded.emit()
+            cache   = IndexCache()
+            entries = [cache.get(filename) for filename in self.filenames]
+            missing = [f for f, entry in zip(self.filenames, entries) if entry is None]
+            pool = results = None
+            if len(missing) >= self.parallel_files and cpu_count() > 1:
+                pool = index_pool(len(missing))
+                results = pool.imap(index_file, missing)
+            try: self._load(cache, entries, results)
+            finally:
+                if pool is not None:
+                    #worker processes may be killed: they write nothing
+                    if self.stopped: pool.terminate()
+                    else: pool.close()
+                    pool.join()
+        #end def
+        
+        def _load(self, cache, entries, results):
+            offset = 0
+            for i, filename in enumerate(self.filenames):
+                if self.stopped: break
+                self.file_started.emit(i, len(self.filenames), filename)
+                cached = entries[i]
+                if cached is None and results is not None:
+                    result = self._wait(results)
+                    if result is None: break
+                    ids, descriptions, error = result
+                    if error is not None:
+                        print 'Unable to load %s:\n%s' % (filename, error)
+                        continue
+                    cache.put(filename, ids, descriptions)
+                    self._send_records(ids, descriptions)
+                    offset += len(ids)
+                    continue
+                if cached is not None:
+                    ids, descriptions = cached
+                    self._send_records(ids, descriptions)
+                    if None not in descriptions:
+                        offset += len(ids)
+                        continue
+                #BioUtils is imported on demand and in this thread
+                from BioUtils.SeqUtils import SeqView
+                view = SeqView()
+                view.load([filename])
+                if cached is None:
+                    ids = view.keys()
+                    descriptions = [None]*len(ids)
+                    self._send_records(ids, None)
+                self._describe(view, ids, descriptions, offset)
+                view.close()
+                cache.put(filename, ids, descriptions)
+                offset += len(ids)
+        #end def
+        
+        @pyqtSlot()
+        def abort(self): self.stopped = True
+    #end class
             
     def __init__(self, parent=None):
         QTableView.__init__(self, parent)
@@ -180,75 +439,1001 @@ class SequenceTableView(QTableView):
         self.setAlternatingRowColors(True)
         self.setWordWrap(True)
         self.clicked.connect(self._toggle_selection)
+        self.verticalScrollBar().valueChanged.connect(self._scrolled)
         self._loader = None
-        self._db = None
-        self._selected = []
+        self._seq_index = None
+        self._query = ''
+        self._file  = ''
+        #IDs to select, also those that are not loaded yet
+        self._wanted = set()
+        self._selection = RowSelection()
+        #database row of the last clicked record; a shift-click selects
+        #the records from it to the clicked one
+        self._anchor  = None
+        self._sending = False
+        #IDs added and removed since the last send
+        self._to_add    = set()
+        self._to_remove = set()
+        self._send_all  = False
+        self._send_timer = QTimer(self)
+        self._send_timer.setSingleShot(True)
+        self._send_timer.timeout.connect(self._send_ids)
     
     def __del__(self):
         if self._loader is not None:
+            self._loader.abort()
             self._loader.wait()
-        if self._db is not None: 
-            self._db.close()
         
     def clear(self):
         self.clearSelection()
         self.setModel(None)
-        if self._db is not None: 
-            self._db.close()
-        self._db = None
+        self._seq_index = None
+    
+    def _show_status(self):
+        index = self._seq_index
+        if self._loader is not None:
+            status = '%s: %d records' % (self._file, len(index))
+            if len(index): status += ', %d%% described' % (index.described*100/len(index))
+        elif index is None: status = ''
+        elif index.described < len(index):
+            status = 'Loading stopped: %d records, %d described' % (len(index), index.described)
+        else: status = '%d records' % len(index)
+        self.status.emit(status)
+    #end def
+    
+    def _fetch_visible(self):
+        '''Fetch new rows if fewer than prefetch_pages-1 viewport heights
+        are left below the visible ones; the records of the visible rows
+        that are not described yet are described first'''
+        model = self.model()
+        if model is None: return
+        page  = max(self.viewport().height()//max(self.verticalHeader().defaultSectionSize(), 1), 1)
+        model.rows_to_load = page*self.prefetch_pages
+        first = max(self.rowAt(0), 0)
+        last  = self.rowAt(self.viewport().height()-1)
+        if last < 0: last = model.rowCount()-1
+        if model.canFetchMore() and model.rowCount()-1-last < page*(self.prefetch_pages-1):
+            model.fetchMore()
+        if self._loader is not None:
+            descriptions = self._seq_index.descriptions
+            db_rows = model.db_rows(first, min(first+page, model.rowCount()))
+            if any(descriptions[row] is None for row in db_rows):
+                self._loader.describe_first(list(db_rows))
+    #end def
+    
+    @pyqtSlot(int)
+    def _scrolled(self, _value): self._fetch_visible()
+    
+    def resizeEvent(self, event):
+        QTableView.resizeEvent(self, event)
+        self._fetch_visible()
+    #end def
+    
+    @pyqtSlot(int, int, str)
+    def _file_started(self, num, total, filename):
+        if self.sender() is not self._loader: return
+        self._file = 'Loading file %d of %d' % (num+1, total)
+        self.setToolTip(filename)
+        self._show_status()
+    #end def
+    
+    @pyqtSlot(object, object)
+    def _add_records(self, ids, descriptions):
+        if self.sender() is not self._loader: return
+        index = self._seq_index
+        start = len(index)
+        index.extend(ids, descriptions)
+        self._selection.resize(len(index))
+        new_rows = xrange(start, len(index))
+        model = self.model()
+        if model is None:
+            model = SequenceTableModel(index)
+            self.setModel(model)
+            self.setMinimumHeight(self.rowHeight(0)*min(SequenceTableModel.rows_to_load+1, len(index)))
+            self.resizeColumnsToContents()
+            model.rowsInserted.connect(self._select_fetched)
+            self.show()
+            self.loaded.emit()
+        elif self._query: 
+            model.extend_filter(index.search(self._query, new_rows))
+        #the IDs from use_sequences may be among the new records
+        if self._wanted:
+            wanted = [row for row in new_rows if index.ids[row] in self._wanted]
+            if wanted: self._change_selection(self._selection.add(wanted), [], False)
+        self._fetch_visible()
+        self._show_status()
+    #end def
+    
+    @pyqtSlot(int, object)
+    def _add_descriptions(self, start, descriptions):
+        if self.sender() is not self._loader: return
+        self._seq_index.set_descriptions(start, descriptions)
+        model = self.model()
+        if model is not None: model.descriptions_changed(start, start+len(descriptions))
+        self._show_status()
+    #end def
     
     @pyqtSlot()
-    def _db_loaded(self):
-        self._db = self._loader.db.clone()
-        self._loader.db.close()
+    def _loader_finished(self):
+        if self.sender() is not self._loader: return
+        self._loader.wait()
         self._loader = None
-        if self._db: 
-            self.setModel(SequenceTableModel(self._db))
-            self.setMinimumHeight(self.rowHeight(0)*min(SequenceTableModel.rows_to_load+1, len(self._db)))
+        self.setToolTip('')
+        model = self.model()
+        if model is None: 
+            self.clear()
+            self.loaded.emit()
+        else:
             self.resizeColumnsToContents()
-            self.model().select_row.connect(self.selectRow)
-            self.show()
-        else: self.clear()
-        self.loaded.emit()
+            #descriptions may add matches to the current filter
+            if self._query: self.set_filter(self._query)
+        self._show_status()
+        self.load_finished.emit()
+    #end def
         
     def load_db(self, filenames):
         self.clear()
+        self._seq_index = SequenceIndex()
         self._loader = self._Loader(filenames)
-        self._loader.loaded.connect(self._db_loaded)
-        self.abort_loading.connect(self._loader.terminate)
+        self._loader.file_started.connect(self._file_started)
+        self._loader.records.connect(self._add_records)
+        self._loader.described.connect(self._add_descriptions)
+        self._loader.finished.connect(self._loader_finished)
+        self.abort_loading.connect(self._loader.abort)
         self._loader.start()
         
     @property
     def loading(self): return self._loader is not None
     
+    @property
+    def selected_count(self): return len(self._selection)
+    
+    def _select_ranges(self, ranges, command):
+        '''Select or deselect the (first, last) ranges of rows'''
+        model = self.model()
+        last_column = model.columnCount()-1
+        selection = QItemSelection()
+        for start, end in ranges:
+            selection.select(model.index(start, 0), model.index(end, last_column))
+        self.selectionModel().select(selection, command)
+    #end def
+    
+    def _select_runs(self, first, flags, command):
+        '''Select or deselect the runs of set flags of the rows from first on'''
+        self._select_ranges([(first+start, first+end) for start, end 
+                             in RowSelection.runs(flags)], command)
+    #end def
+    
+    def _show_selection(self):
+        '''Select the fetched rows of the model that show selected database rows'''
+        model = self.model()
+        if model is None: return
+        flags = self._selection.flags(model.db_rows(0, model.rowCount()))
+        self._select_runs(0, flags, QItemSelectionModel.ClearAndSelect)
+    #end def
+    
+    @pyqtSlot('QModelIndex', int, int)
+    def _select_fetched(self, _parent, first, last):
+        model = self.model()
+        flags = self._selection.flags(model.db_rows(first, last+1))
+        if flags.count('\x01'): self._select_runs(first, flags, QItemSelectionModel.Select)
+    #end def
+    
+    def _change_selection(self, added, removed, send=True):
+        '''Show the database rows added to and removed from the selection 
+        and emit the change; the IDs are sent later if send is True'''
+        if not added and not removed: return
+        model = self.model()
+        if model is not None:
+            fetched = model.rowCount()
+            if len(added)+len(removed) > fetched: self._show_selection()
+            else:
+                #only the changed rows are touched, so that a click 
+                #does not depend on the number of fetched rows
+                for db_rows, command in ((added, QItemSelectionModel.Select), 
+                                         (removed, QItemSelectionModel.Deselect)):
+                    ranges = []
+                    for row in sorted(model.row(db_row) for db_row in db_rows):
+                        if not 0 <= row < fetched: continue
+                        if ranges and ranges[-1][1] == row-1: ranges[-1][1] = row
+                        else: ranges.append([row, row])
+                    if ranges: self._select_ranges(ranges, command)
+        ids = self._seq_index.ids
+        added   = [ids[row] for row in added]
+        removed = [ids[row] for row in removed]
+        self.selection_changed.emit(added, removed)
+        if not send: return
+        if self._send_all: pass
+        elif (len(added)+len(removed)+len(self._to_add)+len(self._to_remove) 
+              > self.max_changes):
+            self._to_add    = set()
+            self._to_remove = set()
+            self._send_all  = True
+        else:
+            #a change that is undone before the send is not sent
+            for sid in added:
+                if sid in self._to_remove: self._to_remove.discard(sid)
+                else: self._to_add.add(sid)
+            for sid in removed:
+                if sid in self._to_add: self._to_add.discard(sid)
+                else: self._to_remove.add(sid)
+        self._send_timer.start(self.send_delay)
+    #end def
+    
+    def _drop_changes(self):
+        self._send_timer.stop()
+        self._to_add    = set()
+        self._to_remove = set()
+        self._send_all  = False
+    #end def
+    
+    def _selected_ids(self):
+        ids = self._selection.select(self._seq_index.ids)
+        #keep the wanted IDs of the records that are not loaded yet
+        if self.loading:
+            rows = self._seq_index.rows
+            ids.extend(sid for sid in self._wanted if sid not in rows)
+        return ids
+    #end def
+    
+    @pyqtSlot()
+    def _send_ids(self):
+        added, removed, send_all = self._to_add, self._to_remove, self._send_all
+        self._drop_changes()
+        if self._seq_index is None: return
+        #the line edit sends its text back to set_ids
+        self._sending = True
+        try:
+            if send_all: self.send_ids.emit(self._selected_ids())
+            elif added or removed:
+                #added IDs are appended in the order of the records;
+                #the IDs of the records that are not loaded yet are not changed
+                self.send_changes.emit(sorted(added, key=self._seq_index.rows.get), 
+                                       list(removed))
+        finally: self._sending = False
+    #end def
+    
     @pyqtSlot('QModelIndex')
     def _toggle_selection(self, index):
-        try: 
-            i = self._selected.index(index.row())
-            del self._selected[i]
-        except ValueError:
-            self._selected.append(index.row())
-        self.send_ids.emit([self.model().sid(row) for row in self._selected])
+        model  = self.model()
+        db_row = model.db_row(index.row())
+        anchor = self._anchor
+        self._anchor = db_row
+        if anchor is not None and QApplication.keyboardModifiers() & Qt.ShiftModifier:
+            first = model.row(anchor)
+            if first >= 0: 
+                self.select_range(first, index.row())
+                return
+        if self._selection.toggle(db_row): self._change_selection([db_row], [])
+        else: self._change_selection([], [db_row])
+    #end def
+    
+    def select_range(self, first, last):
+        '''Add the records shown by the rows from first to last to the selection'''
+        model = self.model()
+        first, last = min(first, last), max(first, last)
+        if model.filtered: added = self._selection.add(model.db_rows(first, last+1))
+        else: added = self._selection.add_range(first, last+1)
+        self._change_selection(added, [])
+        #the clicked row was toggled by the view itself
+        last = min(last, model.rowCount()-1)
+        self._select_runs(first, bytearray('\x01')*(last-first+1), QItemSelectionModel.Select)
+    #end def
+    
+    @pyqtSlot()
+    def select_all(self):
+        '''Add all the records that pass the filter to the selection'''
+        model = self.model()
+        if model is None: return
+        if model.filtered: added = self._selection.add(model.filter_rows)
+        else: added = self._selection.add_range(0, len(self._seq_index))
+        self._change_selection(added, [])
+    #end def
+    
+    @pyqtSlot()
+    def deselect_all(self):
+        '''Remove all the records that pass the filter from the selection'''
+        model = self.model()
+        if model is None: return
+        if model.filtered: removed = self._selection.discard(model.filter_rows)
+        else: removed = self._selection.clear()
+        self._change_selection([], removed)
+    #end def
+    
+    @pyqtSlot()
+    def invert_selection(self):
+        '''Invert the selection of the records that pass the filter'''
+        model = self.model()
+        if model is None: return
+        self._change_selection(*self._selection.invert(model.filter_rows 
+                                                       if model.filtered else None))
+    #end def
         
     def clearSelection(self):
-        self._selected = []
+        self._selection = RowSelection(len(self._seq_index) 
+                                       if self._seq_index is not None else 0)
+        self._anchor = None
+        self._drop_changes()
         QTableView.clearSelection(self)
     
     @pyqtSlot('QString')
     def set_ids(self, ids):
-        self.clearSelection()
-        ids = [sid.rstrip(', ') for sid in unicode(ids).split(', ')]
-        if not ids: return
+        if self._sending: return
+        #the IDs given replace the changes that are not sent yet
+        self._drop_changes()
+        #IDs of the records are byte strings; comparing them
+        #with unicode ones is several times slower
+        ids = unicode(ids).encode('UTF-8').split(',')
+        self._wanted = set(map(str.strip, ids))
+        self._wanted.discard('')
         model = self.model()
-        rows_loaded = model.rowCount()
-        self._selected = model.sindexes(ids)
-        for i, row in enumerate(self._selected):
-            if row >= rows_loaded:
-                model.to_select(self._selected[i:])
-                break
-            self.selectRow(row)
-                
+        if model is None: return
+        self._change_selection(*self._selection.set_rows(model.sindexes(self._wanted)), 
+                               send=False)
+    #end def
+    
+    @pyqtSlot('QString')
+    def set_filter(self, query):
+        '''Show only the records whose ID or description contains the query,
+        or whose ID starts with it if it starts with ^'''
+        self._query = unicode(query).strip()
+        model = self.model()
+        if model is None: return
+        if self._query: model.set_filter(self._seq_index.search(self._query))
+        elif model.filtered: model.set_filter(None)
+        self._fetch_visible()
+        self.filtered.emit(model.size())
+    #end def
+    
     def scrollTo(self, index, hint = QTableView.EnsureVisible):
         if hint != QTableView.EnsureVisible:
             QTableView.scrollTo(self, index, hint)
-#end class
\ No newline at end of file
+#end class
+
+
+class SequenceFilter(QWidget):
+    '''Filter box of a SequenceTableView with the selection buttons
+    and the loading status'''
+    
+    delay = 200 #ms
+    
+    def __init__(self, view, parent=None):
+        QWidget.__init__(self, parent)
+        self._view  = view
+        self.edit   = QLineEdit(self)
+        self.edit.setPlaceholderText('Filter by ID or description, ^ for ID prefix')
+        self.count  = QLabel(self)
+        self.select = QPushButton('Select all', self)
+        self.select.setToolTip('Select all the sequences that pass the filter')
+        self.invert = QPushButton('Invert', self)
+        self.invert.setToolTip('Invert the selection of the sequences that pass the filter')
+        self.none   = QPushButton('Select none', self)
+        self.none.setToolTip('Deselect all the sequences that pass the filter')
+        self.selected = QLabel(self)
+        self.status = QLabel(self)
+        self.stop   = QPushButton('Stop', self)
+        self.stop.setToolTip('Stop loading; loaded sequences are kept')
+        self.stop.setVisible(view.loading)
+        layout = QGridLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.edit, 0, 0)
+        layout.addWidget(self.count, 0, 1)
+        layout.addWidget(self.select, 0, 2)
+        layout.addWidget(self.invert, 0, 3)
+        layout.addWidget(self.none, 0, 4)
+        layout.addWidget(self.status, 1, 0)
+        layout.addWidget(self.selected, 1, 1)
+        layout.addWidget(self.stop, 1, 2)
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._apply)
+        self.edit.textChanged.connect(self._schedule)
+        self.edit.returnPressed.connect(self._apply)
+        self.select.clicked.connect(view.select_all)
+        self.invert.clicked.connect(view.invert_selection)
+        self.none.clicked.connect(view.deselect_all)
+        view.selection_changed.connect(self._show_selected)
+        self.stop.clicked.connect(view.abort_loading)
+        view.filtered.connect(self._show_count)
+        view.status.connect(self.status.setText)
+        view.load_finished.connect(self.stop.hide)
+    #end def
+    
+    @pyqtSlot('QString')
+    def _schedule(self, _text): self._timer.start(self.delay)
+    
+    @pyqtSlot()
+    def _apply(self):
+        self._timer.stop()
+        self._view.set_filter(self.edit.text())
+    #end def
+    
+    @pyqtSlot(int)
+    def _show_count(self, count):
+        filtered = bool(unicode(self.edit.text()).strip())
+        self.count.setText('%d found' % count if filtered else '')
+    #end def
+    
+    @pyqtSlot(object, object)
+    def _show_selected(self, _added, _removed):
+        count = self._view.selected_count
+        self.selected.setText('%d selected' % count if count else '')
+    #end def
+#end class
+
+
+class JobQueueView(QTableWidget):
+    '''Lists jobs of a JobQueue with their state, elapsed time, 
+    estimated time left and an abort button for each active job'''
+    
+    abort_job    = pyqtSignal(object)
+    job_selected = pyqtSignal(object)
+    
+    _header = ['Job', 'State', 'Elapsed', 'ETA', '']
+    
+    def __init__(self, parent=None):
+        QTableWidget.__init__(self, 0, len(self._header), parent)
+        self.setHorizontalHeaderLabels(self._header)
+        self.horizontalHeader().setResizeMode(0, QHeaderView.Stretch)
+        self.verticalHeader().hide()
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.itemSelectionChanged.connect(self._select_job)
+        self.hide()
+        self._rows = []
+        #update elapsed time of running jobs
+        self._timer = QTimer(self)
+        self._timer.setInterval(1000)
+        self._timer.timeout.connect(self._update_elapsed)
+        self._timer.start()
+    #end def
+    
+    @staticmethod
+    def _elapsed(job): return str(timedelta(seconds=int(job.elapsed)))
+    
+    @staticmethod
+    def _eta(job):
+        eta = job.eta if job.state == job.RUNNING else None
+        return '' if eta is None else str(timedelta(seconds=int(eta)))
+    #end def
+    
+    @pyqtSlot()
+    def _select_job(self):
+        rows = self.selectionModel().selectedRows()
+        if rows: self.job_selected.emit(self._rows[rows[0].row()])
+    #end def
+    
+    @pyqtSlot(object)
+    def add_job(self, job):
+        row = self.rowCount()
+        self.insertRow(row)
+        self._rows.append(job)
+        item = QTableWidgetItem(QString.fromUtf8(job.name))
+        item.setToolTip(QString.fromUtf8(job.cwd))
+        self.setItem(row, 0, item)
+        self.setItem(row, 1, QTableWidgetItem())
+        self.setItem(row, 2, QTableWidgetItem())
+        self.setItem(row, 3, QTableWidgetItem())
+        button = QPushButton('Abort', self)
+        button.clicked.connect(lambda: self.abort_job.emit(job))
+        self.setCellWidget(row, 4, button)
+        self.update_job(job)
+        self.show()
+    #end def
+    
+    @pyqtSlot(object)
+    def update_job(self, job):
+        try: row = self._rows.index(job)
+        except ValueError: return
+        state = job.state
+        if job.state == job.RUNNING and job.stage:
+            state = '%s: %s %d%%' % (state, job.step or job.stage, job.fraction*100)
+        self.item(row, 1).setText(QString.fromUtf8(state))
+        self.item(row, 2).setText(self._elapsed(job))
+        self.item(row, 3).setText(self._eta(job))
+        if job.metrics:
+            self.item(row, 0).setToolTip(QString.fromUtf8('%s\n\n%s' % 
+                                                          (job.cwd, format_metrics(job.metrics))))
+        button = self.cellWidget(row, 4)
+        if button is None: return
+        if not job.active: self.removeCellWidget(row, 4)
+        elif job.state == job.ABORTING: button.setEnabled(False)
+    #end def
+    
+    @pyqtSlot()
+    def _update_elapsed(self):
+        for row, job in enumerate(self._rows):
+            if job.state in (job.RUNNING, job.ABORTING):
+                self.item(row, 2).setText(self._elapsed(job))
+                self.item(row, 3).setText(self._eta(job))
+    #end def
+    
+    @pyqtSlot()
+    def remove_finished(self):
+        for row in xrange(len(self._rows)-1, -1, -1):
+            if not self._rows[row].active:
+                self.removeRow(row)
+                del self._rows[row]
+        if not self._rows: self.hide()
+    #end def
+#end class
+
+
+class StageProgressView(QTreeWidget):
+    '''Per-stage breakdown of the progress of a job: 
+    stages with their steps, done fraction, elapsed time and ETA'''
+    
+    _header = ['Stage', 'Done', 'Elapsed', 'ETA']
+    
+    def __init__(self, parent=None):
+        QTreeWidget.__init__(self, parent)
+        self.setColumnCount(len(self._header))
+        self.setHeaderLabels(self._header)
+        self.header().setResizeMode(0, QHeaderView.Stretch)
+        self.setRootIsDecorated(False)
+        self.hide()
+        self.job    = None
+        self._items = dict()
+        #update elapsed time and ETA of the running step
+        self._timer = QTimer(self)
+        self._timer.setInterval(1000)
+        self._timer.timeout.connect(self._update_times)
+        self._timer.start()
+    #end def
+    
+    @staticmethod
+    def _time(seconds): 
+        return '' if seconds is None else str(timedelta(seconds=int(seconds)))
+    
+    def _update_item(self, item, rec):
+        fraction, start, end = rec
+        self._set_text(item, 1, '%d%%' % (fraction*100) if end is None else 'done')
+        self._set_text(item, 2, self._time((end or time())-start))
+        eta = None
+        if end is None and 0 < fraction < 1:
+            eta = (time()-start)*(1-fraction)/fraction
+        self._set_text(item, 3, self._time(eta))
+    #end def
+    
+    @staticmethod
+    def _set_text(item, column, text): item.setText(column, QString.fromUtf8(text))
+    
+    @pyqtSlot(object)
+    def show_job(self, job):
+        self.job = job
+        self.clear()
+        self._items = dict()
+        self.update_job(job)
+        self.show()
+    #end def
+    
+    @pyqtSlot(object)
+    def update_job(self, job):
+        if job is not self.job: return
+        for (stage, step), rec in job.progress.iteritems():
+            item = self._items.get((stage, step))
+            if item is None:
+                if step:
+                    parent = self._items.get((stage, ''))
+                    item = QTreeWidgetItem(parent) if parent else QTreeWidgetItem(self)
+                else: item = QTreeWidgetItem(self)
+                item.setText(0, QString.fromUtf8(step or stage))
+                self._items[(stage, step)] = item
+                if item.parent(): item.parent().setExpanded(True)
+            self._update_item(item, rec)
+    #end def
+    
+    @pyqtSlot()
+    def _update_times(self):
+        if self.job is None or self.job.state != self.job.RUNNING: return
+        self.update_job(self.job)
+    #end def
+#end class
+
+
+class ProfileView(QTableWidget):
+    '''Sortable table of the functions of a profiled analysis'''
+    
+    _header = ['Function', 'Calls', 'Primitive calls', 
+               'Total time, s', 'Cumulative time, s']
+    
+    def __init__(self, rows, filename='', parent=None):
+        QTableWidget.__init__(self, len(rows), len(self._header), parent)
+        self.setHorizontalHeaderLabels(self._header)
+        self.horizontalHeader().setResizeMode(0, QHeaderView.Stretch)
+        self.verticalHeader().hide()
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setSelectionBehavior(QAbstractItemView.SelectRows)
+        if filename: self.setToolTip(QString.fromUtf8('Full profile: %s' % filename))
+        for r, row in enumerate(rows):
+            self.setItem(r, 0, QTableWidgetItem(QString.fromUtf8(row[0])))
+            for c, value in enumerate(row[1:], 1):
+                #numbers are sorted by value, not as text
+                item = QTableWidgetItem()
+                item.setData(Qt.DisplayRole, QVariant(value))
+                self.setItem(r, c, item)
+        self.setSortingEnabled(True)
+        self.sortByColumn(4, Qt.DescendingOrder)
+    #end def
+#end class
+
+
+class TextFileLoader(QThread):
+    '''Reads and decodes a text file in chunks in a separate thread.
+    Chunks are taken with get() from a bounded queue, so the reader
+    never runs far ahead of the consumer; ready is emitted once for 
+    every chunk put there, including the final None.'''
+    
+    chunk_size = 1<<16
+    
+    ready = pyqtSignal()
+    
+    def __init__(self, filename, encoding='UTF-8', parent=None):
+        QThread.__init__(self, parent)
+        self.filename  = filename
+        self.error     = None
+        self._encoding = encoding
+        self._chunks   = Queue(maxsize=8)
+        self._stop     = False
+    #end def
+    
+    def __del__(self): self.stop()
+    
+    def _put(self, item):
+        while not self._stop:
+            try: 
+                self._chunks.put(item, timeout=0.1)
+                self.ready.emit()
+                return
+            except Full: pass
+    #end def
+    
+    def run(self):
+        decoder = codecs.getincrementaldecoder(self._encoding)('replace')
+        try:
+            with open(self.filename, 'rb') as inp:
+                while not self._stop:
+                    data = inp.read(self.chunk_size)
+                    text = decoder.decode(data, not data)
+                    if text: self._put(text)
+                    if not data: break
+        except (IOError, OSError), e: self.error = str(e)
+        self._put(None)
+    #end def
+    
+    def get(self):
+        '''Next chunk of text; '' if it is not read yet, None at the end'''
+        try: return self._chunks.get_nowait()
+        except Empty: return ''
+    #end def
+    
+    def stop(self):
+        self._stop = True
+        self.wait()
+    #end def
+#end class
+
+
+class LineIndexer(QThread):
+    '''Builds a LineIndex in a separate thread; 
+    progress is emitted with the number of lines indexed so far'''
+    
+    progress = pyqtSignal(int)
+    
+    def __init__(self, index, parent=None):
+        QThread.__init__(self, parent)
+        self._index = index
+        self._stop  = False
+    #end def
+    
+    def __del__(self): self.stop()
+    
+    def run(self):
+        last = time()
+        while not self._stop and self._index.index_chunk():
+            if time()-last > 0.1:
+                self.progress.emit(len(self._index))
+                last = time()
+        self.progress.emit(len(self._index))
+    #end def
+    
+    def stop(self):
+        self._stop = True
+        self.wait()
+    #end def
+#end class
+
+
+class LargeTextView(QAbstractScrollArea):
+    '''Read-only viewer of a text file of any size. 
+    The file is memory-mapped and indexed in the background;
+    only the lines that are visible are read and painted, so scrolling 
+    takes the same time and memory regardless of the file size.'''
+    
+    _margin = 4
+    
+    def __init__(self, filename, parent=None):
+        QAbstractScrollArea.__init__(self, parent)
+        font = QFont('Monospace')
+        font.setStyleHint(QFont.TypeWriter)
+        self.setFont(font)
+        self.viewport().setBackgroundRole(QPalette.Base)
+        self.verticalScrollBar().valueChanged.connect(self.viewport().update)
+        self.horizontalScrollBar().valueChanged.connect(self.viewport().update)
+        self.index      = LineIndex(filename)
+        #TextSearch with byte offsets of the matches to highlight
+        self._matches   = None
+        #(start, end) byte offsets of the current match
+        self._current   = None
+        self._width     = 0
+        self._indexer   = LineIndexer(self.index)
+        self._indexer.progress.connect(self._update_range)
+        self._indexer.start()
+    #end def
+    
+    def __del__(self): self.close_file()
+    
+    def close_file(self):
+        if self._indexer is None: return
+        self._indexer.stop()
+        self._indexer = None
+        self.index.close()
+    #end def
+    
+    def _page(self):
+        return max(1, self.viewport().height() // self.fontMetrics().lineSpacing())
+    
+    @pyqtSlot()
+    def _update_range(self):
+        page = self._page()
+        vbar = self.verticalScrollBar()
+        vbar.setPageStep(page)
+        vbar.setRange(0, max(0, len(self.index)-page+1))
+        hbar = self.horizontalScrollBar()
+        hbar.setPageStep(self.viewport().width())
+        hbar.setRange(0, max(0, self._width+2*self._margin-self.viewport().width()))
+        self.viewport().update()
+    #end def
+    
+    def resizeEvent(self, event):
+        QAbstractScrollArea.resizeEvent(self, event)
+        self._update_range()
+    #end def
+    
+    def _line_matches(self, start, end):
+        '''(start, end, is_current) of the matches within a line'''
+        matches = []
+        if self._matches is not None:
+            for i in self._matches.in_range(start, end+1):
+                matches.append(self._matches.match(i)+(False,))
+        if self._current is not None and start <= self._current[0] <= end:
+            matches.append(self._current+(True,))
+        return matches
+    #end def
+    
+    def paintEvent(self, event):
+        painter = QPainter(self.viewport())
+        metrics = self.fontMetrics()
+        height  = metrics.lineSpacing()
+        first   = self.verticalScrollBar().value()
+        x       = self._margin-self.horizontalScrollBar().value()
+        width   = self._width
+        colors  = (QColor(Qt.yellow), self.palette().highlight())
+        data    = self.index.data
+        for i, (start, end) in enumerate(self.index.spans(first, self._page()+1)):
+            y   = i*height
+            raw = data[start:min(end, start+self.index.max_line)]
+            for m_start, m_end, current in self._line_matches(start, end):
+                left  = metrics.width(raw[:m_start-start].decode('UTF-8', 'replace').expandtabs())
+                right = metrics.width(raw[:m_end-start].decode('UTF-8', 'replace').expandtabs())
+                painter.fillRect(x+left, y, right-left, height, colors[current])
+            text = raw.decode('UTF-8', 'replace').expandtabs()
+            painter.drawText(x, y+metrics.ascent(), text)
+            width = max(width, metrics.width(text))
+        painter.end()
+        #the widest line is known only for the lines that were shown
+        if width > self._width:
+            self._width = width
+            self._update_range()
+    #end def
+    
+    def scroll_to_line(self, line):
+        vbar = self.verticalScrollBar()
+        if not vbar.value() <= line < vbar.value()+self._page():
+            vbar.setValue(line-self._page()//2)
+    #end def
+    
+    def set_matches(self, matches):
+        '''Highlight all matches of a TextSearch over index.data'''
+        #the current match belongs to the previous search
+        if matches is not self._matches: self._current = None
+        self._matches = matches
+        self.viewport().update()
+    #end def
+    
+    def show_match(self, start, end):
+        '''Scroll to a match given by byte offsets and mark it as current;
+        returns False if that part of the file is not indexed yet'''
+        if start >= self.index.indexed: return False
+        self._current = (start, end)
+        self.scroll_to_line(self.index.line_at(start))
+        self.viewport().update()
+        return True
+    #end def
+    
+    @property
+    def position(self):
+        '''Byte offset of the current match or of the first visible line'''
+        if self._current is not None: return self._current[0]
+        line = self.verticalScrollBar().value()
+        return self.index.offset(line) if line < len(self.index) else 0
+    #end def
+#end class
+
+
+class TextSearch(QThread):
+    '''Finds all matches of a compiled regular expression in a text,
+    a unicode string or a memory-mapped file, in a separate thread.
+    The text is searched in chunks that end at line ends, so the search
+    can be cancelled between chunks; matches spanning lines are not found.
+    Matches found so far may be used while the search is running.'''
+    
+    chunk_size = 1<<20
+    
+    progress = pyqtSignal(int)
+    
+    def __init__(self, text, pattern, parent=None):
+        QThread.__init__(self, parent)
+        self.pattern  = pattern
+        self.starts   = array('L')
+        self.ends     = array('L')
+        self.complete = False
+        self._text    = text
+        self._stop    = False
+    #end def
+    
+    def __del__(self): 
+        self.cancel()
+        self.wait()
+    #end def
+    
+    def __len__(self): return len(self.starts)
+    
+    def run(self):
+        text = self._text; size = len(text); pos = 0
+        finditer = self.pattern.finditer
+        last = time()
+        while pos < size:
+            if self._stop: return
+            end = text.find('\n', min(pos+self.chunk_size, size))
+            end = size if end < 0 else end+1
+            for match in finditer(text, pos, end):
+                start, stop = match.span()
+                if start == stop: continue
+                #the GUI thread counts matches by starts, 
+                #so the end of a match must be there first
+                self.ends.append(stop)
+                self.starts.append(start)
+            pos = end
+            if time()-last > 0.1:
+                self.progress.emit(len(self.starts))
+                last = time()
+        self.complete = True
+        self.progress.emit(len(self.starts))
+    #end def
+    
+    def cancel(self): self._stop = True
+    
+    def match(self, i): return self.starts[i], self.ends[i]
+    
+    def nearest(self, offset, backward=False):
+        '''Number of the first match that starts after the offset or 
+        of the last one that starts before it; wraps around'''
+        if backward: return (bisect_left(self.starts, offset)-1) % len(self.starts)
+        i = bisect_left(self.starts, offset+1)
+        return i if i < len(self.starts) else 0
+    #end def
+    
+    def in_range(self, start, end):
+        '''Numbers of the matches that start within [start, end)'''
+        return xrange(bisect_left(self.starts, start), 
+                      bisect_left(self.starts, end))
+    #end def
+#end class
+
+
+class ReportSearch(QObject):
+    '''Debounced background search in a text: search() restarts it 
+    after a pause in typing, cancelling the search that is running.
+    updated is emitted with the TextSearch as matches are found, 
+    or with None if there is nothing to search for.'''
+    
+    delay = 250 #ms
+    
+    updated = pyqtSignal(object)
+    error   = pyqtSignal(str)
+    
+    def __init__(self, parent=None):
+        QObject.__init__(self, parent)
+        self.results    = None
+        self._text      = None
+        self._term      = ''
+        self._regex     = False
+        self._case      = False
+        self._cancelled = []
+        self._timer     = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._start)
+    #end def
+    
+    def __del__(self): self.stop()
+    
+    def set_text(self, text):
+        '''Text to search in: unicode or a memory-mapped file'''
+        self._text = text
+        if self._term: self._start()
+    #end def
+    
+    def search(self, term, regex=False, case=False):
+        self._term  = unicode(term)
+        self._regex = regex
+        self._case  = case
+        self._timer.start(self.delay)
+    #end def
+    
+    def _pattern(self):
+        term  = self._term
+        flags = re.M
+        if not self._case: flags |= re.I
+        if isinstance(self._text, unicode): flags |= re.U
+        else: term = term.encode('UTF-8')
+        if not self._regex: term = re.escape(term)
+        return re.compile(term, flags)
+    #end def
+    
+    @pyqtSlot()
+    def _start(self):
+        self._timer.stop()
+        self._cancel()
+        if not self._term or self._text is None:
+            self.updated.emit(None)
+            return
+        try: pattern = self._pattern()
+        except re.error, e:
+            self.error.emit(str(e))
+            self.updated.emit(None)
+            return
+        self.results = TextSearch(self._text, pattern)
+        self.results.progress.connect(self._on_progress)
+        self.results.start()
+    #end def
+    
+    def _cancel(self):
+        if self.results is None: return
+        self.results.cancel()
+        #keep a running thread alive until it finishes
+        if self.results.isRunning():
+            self._cancelled.append(self.results)
+            self.results.finished.connect(self._reap)
+        self.results = None
+    #end def
+    
+    @pyqtSlot()
+    def _reap(self):
+        thread = self.sender()
+        thread.wait()
+        if thread in self._cancelled: self._cancelled.remove(thread)
+    #end def
+    
+    @pyqtSlot(int)
+    def _on_progress(self, _count):
+        if self.sender() is self.results: self.updated.emit(self.results)
+    
+    def stop(self):
+        self._timer.stop()
+        self._cancel()
+        for thread in self._cancelled: thread.wait()
+        self._cancelled = []
+    #end def
+#end class
@@ -19,34 +19,248 @@ Created on Mar 4, 2013
 @author: Allis Tauri <allista@gmail.com>
 '''
 
+import os
+import re
+import sys
+import pstats
+import cProfile
+from time import time, strftime, localtime
 import SubprocessBase
+import Messages
+import Telemetry
 from DegenPrimer.DegenPrimerConfig import DegenPrimerConfig
 from DegenPrimer.Pipeline import Pipeline
 from DegenPrimer.AnalysisTask import AnalysisTask
 from DegenPrimer.OptimizationTask import OptimizationTask
 
 
+class StageTimer(object):
+    '''Start time, duration and result of every stage of a job 
+    and of every step within a stage'''
+    
+    def __init__(self):
+        self.rows   = [] #[stage, step, start, end, result]
+        self._stage = None
+        self._step  = None
+    #end def
+    
+    def _add(self, stage, step=''):
+        row = [stage, step, time(), None, '']
+        self.rows.append(row)
+        return row
+    #end def
+    
+    @staticmethod
+    def _end(row, result):
+        if row is None or row[3] is not None: return
+        row[3] = time()
+        row[4] = result
+    #end def
+    
+    def start(self, stage):
+        self.finish()
+        self._stage = self._add(stage)
+    #end def
+    
+    def step(self, step):
+        if self._stage is None: return
+        self._end(self._step, 'done')
+        self._step = self._add(self._stage[0], step)
+    #end def
+    
+    def finish(self, result='done'):
+        self._end(self._step, result)
+        self._end(self._stage, result)
+        self._stage = self._step = None
+    #end def
+    
+    def write(self, filename):
+        self.finish('unfinished')
+        lines = [('Stage', 'Step', 'Started', 'Duration, s', 'Result')]
+        for stage, step, start, end, result in self.rows:
+            lines.append((stage if not step else '', step or '-', 
+                          strftime('%H:%M:%S', localtime(start)), 
+                          '%.2f' % (end-start), result))
+        widths = [max(len(line[i]) for line in lines) for i in xrange(5)]
+        with open(filename, 'w') as out:
+            for line in lines:
+                out.write('  '.join(field.ljust(width) 
+                                    for field, width in zip(line, widths)).rstrip()+'\n')
+    #end def
+#end class
+
+
+class ProgressStream(object):
+    '''Passes the output of the pipeline on and reports every change
+    of a "label: NN%" progress indicator printed by the tasks.
+    An indicator redraws its line in place, so only a whole line that
+    follows a carriage return is taken; percentages in other output, 
+    like annotations or option values, are not progress.'''
+    
+    _percent = re.compile(r'\r[ \t]*([^\r\n%]*?)[ \t:]*(\d{1,3}(?:\.\d+)?)[ \t]*%[ \t]*(?=[\r\n]|$)')
+    
+    def __init__(self, stream, callback):
+        self._stream   = stream
+        self._callback = callback
+        self._pid      = os.getpid()
+        self._last     = None
+    #end def
+    
+    def write(self, text):
+        self._stream.write(text)
+        #processes forked by the pipeline must not use the connection
+        if os.getpid() != self._pid: return
+        matches = self._percent.findall(text)
+        if not matches: return
+        label, percent = matches[-1]
+        label   = label.strip()
+        percent = min(float(percent), 100.0)
+        #report only changes of the whole percent
+        if (label, int(percent)) == self._last: return
+        self._last = (label, int(percent))
+        self._callback(label, percent/100.0)
+    #end def
+    
+    def flush(self): self._stream.flush()
+    
+    def isatty(self): return self._stream.isatty()
+#end class
+
+
 class DegenPrimerSubprocess(SubprocessBase.SubprocessBase):
     '''Subprocess for DegenPrimer'''
     def __init__(self):
-        super(DegenPrimerSubprocess, self).__init__()
         self._pipeline = None
+        self._stage    = None
+        self._step     = None
+        self._timer    = None
+        super(DegenPrimerSubprocess, self).__init__()
     #end def
     
     def _initialize(self):
         self._pipeline = Pipeline(self._abort_event)
-        self._pipeline.register_task(OptimizationTask(self._abort_event))
-        self._pipeline.register_task(AnalysisTask(self._abort_event))
+        self._pipeline.register_task(self._staged(OptimizationTask(self._abort_event)))
+        self._pipeline.register_task(self._staged(AnalysisTask(self._abort_event)))
         return True
     #end def
     
+    def _staged(self, task):
+        '''Report each run of the task to the server as a pipeline stage'''
+        stage = task.__class__.__name__.replace('Task', '')
+        run   = task.run
+        def staged_run(*args, **kwargs):
+            self._stage = stage; self._step = None
+            self._timer.start(stage)
+            self._send(Messages.stage_started(stage))
+            self._send(Messages.progress(stage, 0.0))
+            try: result = run(*args, **kwargs)
+            except:
+                self._timer.finish('failed')
+                self._send(Messages.stage_finished(stage, False))
+                raise
+            finally: self._stage = None
+            self._timer.finish('failed' if result else 'done')
+            self._send(Messages.progress(stage, 1.0))
+            self._send(Messages.stage_finished(stage, not result))
+            return result
+        task.run = staged_run
+        return task
+    #end def
+    
+    def _step_progress(self, step, fraction):
+        '''Progress of a step printed by a task of the current stage'''
+        if self._stage is None: return
+        if step != self._step:
+            self._step = step
+            self._timer.step(step)
+        self._send(Messages.progress(self._stage, fraction, step))
+    #end def
+    
+    def _write_timings(self, config):
+        '''Save the timing table next to the reports'''
+        filename = '%s-timings.txt' % config.job_id
+        try: self._timer.write(filename)
+        except IOError, e:
+            print 'Unable to write timings to %s:\n%s' % (filename, str(e))
+            return
+        register = getattr(config, 'register_report', None)
+        if register is not None: register('Timings', filename)
+    #end def
+    
+    def _send_metrics(self, metrics, config):
+        '''Append the resources used by the job to <job_id>-metrics.tsv'''
+        filename = os.path.abspath('%s-metrics.tsv' % config.job_id)
+        try: Telemetry.append_metrics(filename, metrics, job=config.job_id)
+        except IOError, e:
+            print 'Unable to write metrics to %s:\n%s' % (filename, str(e))
+            filename = ''
+        self._send(Messages.metrics(metrics, filename))
+    #end def
+    
+    def _stream_reports(self, config):
+        '''Tell the server about every report as soon as it is written'''
+        register = getattr(config, 'register_report', None)
+        if register is None: return
+        def register_and_send(name, filename, *args, **kwargs):
+            result = register(name, filename, *args, **kwargs)
+            self._send(Messages.report_ready(name, os.path.abspath(filename)))
+            return result
+        config.register_report = register_and_send
+    #end def
+    
+    _profile_rows = 300
+    
+    def _profiling(self):
+        return bool(os.environ.get('DP_PROFILE', False)
+                    or self._settings.get('profile'))
+    #end def
+    
+    def _send_profile(self, profiler, config):
+        '''Save the profile as <job_id>.prof and send the top functions
+        by cumulative time to the server'''
+        filename = os.path.abspath('%s.prof' % config.job_id)
+        try: profiler.dump_stats(filename)
+        except IOError, e:
+            print 'Unable to save profile to %s:\n%s' % (filename, str(e))
+            filename = ''
+        stats = pstats.Stats(profiler).stats
+        rows  = []
+        for (path, line, func), (pcalls, calls, tottime, cumtime, _callers) in stats.iteritems():
+            name = func if path == '~' else '%s:%d(%s)' % (os.path.basename(path), line, func)
+            rows.append((name, calls, pcalls, tottime, cumtime))
+        rows.sort(key=lambda row: row[4], reverse=True)
+        self._send(Messages.profile(rows[:self._profile_rows], filename))
+    #end def
+    
+    def _run_pipeline(self, config):
+        #watch progress printed by the tasks
+        self._timer = StageTimer()
+        stdout = sys.stdout
+        sys.stdout = ProgressStream(stdout, self._step_progress)
+        try: return self._pipeline.run(config)
+        finally: sys.stdout = stdout
+    #end def
+    
     def _do_work(self, options):
         #read in configuration
         config = DegenPrimerConfig.from_options(options)
-        #else, run the pipeline
-        if self._pipeline.run(config) == 0: #pass back collected reports
-            self._con.send(config.reports)
-        return 0
+        self._stream_reports(config)
+        #run the pipeline, profiling only this process
+        monitor = Telemetry.ResourceMonitor()
+        monitor.start()
+        try:
+            if self._profiling():
+                profiler = cProfile.Profile()
+                try: result = profiler.runcall(self._run_pipeline, config)
+                finally: self._send_profile(profiler, config)
+            else: result = self._run_pipeline(config)
+        finally: self._send_metrics(monitor.stop(), config)
+        self._write_timings(config)
+        if result == 0: #pass back collected reports
+            reports = [(name, os.path.abspath(filename)) 
+                       for name, filename in config.reports]
+            self._send(Messages.results(reports))
+        return 0 if result == 0 else 1
     #end def
 #end class
 
@@ -0,0 +1,69 @@
+#!/usr/bin/python
+# coding=utf-8
+#
+# Copyright (C) 2013 Allis Tauri <allista@gmail.com>
+# 
+# DegenPrimerGUI is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# DegenPrimerGUI is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Compares the cost of polling the abort flag: SyncManager Event proxy 
+versus SubprocessBase.SharedEvent.
+
+Usage: python benchmarks/abort_event_bench.py [number_of_polls]
+'''
+
+import os
+import sys
+from time import time, sleep
+from multiprocessing import Process
+from multiprocessing.managers import SyncManager
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from DegenPrimerGUI.SubprocessBase import SharedEvent
+
+
+def poll(event, n):
+    t0 = time()
+    for _i in xrange(n): event.is_set()
+    return (time()-t0)/n
+#end def
+
+def _wait_for(event, timeout):
+    sys.exit(0 if event.wait(timeout) else 1)
+
+def child_sees_set(event):
+    '''Check that a forked worker sees the flag set by its parent'''
+    event.clear()
+    p = Process(target=_wait_for, args=(event, 5))
+    p.start(); sleep(0.1); event.set(); p.join()
+    event.clear()
+    return p.exitcode == 0
+#end def
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    mgr = SyncManager()
+    mgr.start()
+    events = (('SyncManager.Event', mgr.Event()),
+              ('SharedEvent', SharedEvent()))
+    print '%d polls of is_set()' % n
+    results = []
+    for name, event in events:
+        per_call = poll(event, n)
+        results.append(per_call)
+        print '%-20s %10.3f us/call  visible in child: %s' % \
+        (name, per_call*1e6, child_sees_set(event))
+    print 'speedup: %.1fx' % (results[0]/results[1])
+    mgr.shutdown()
@@ -0,0 +1,115 @@
+#!/usr/bin/python
+# coding=utf-8
+#
+# Copyright (C) 2013 Allis Tauri <allista@gmail.com>
+# 
+# DegenPrimerGUI is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# DegenPrimerGUI is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Round-trip latency of the two transports used by SubprocessThread:
+an inherited unix socketpair and a localhost TCP listener.
+Both are authenticated the same way as in SubprocessThread.
+
+Usage: python benchmarks/ipc_latency_bench.py [number_of_round_trips]
+'''
+
+import os
+import sys
+import errno
+import socket
+import binascii
+import multiprocessing.connection as mpc
+from _multiprocessing import Connection
+from multiprocessing import Process
+from time import time
+
+
+def echo(con):
+    while True:
+        msg = con.recv()
+        con.send(msg)
+        if msg is None: break
+    con.close()
+#end def
+
+def _tcp_child(port, auth):
+    echo(mpc.Client(('localhost', port), authkey=auth))
+
+def _pair_child(pair, auth):
+    con = Connection(os.dup(pair.fileno()))
+    mpc.answer_challenge(con, auth)
+    mpc.deliver_challenge(con, auth)
+    echo(con)
+#end def
+
+
+def connect_tcp(auth, port=10000):
+    '''Same port search as SubprocessThread._setup_listener'''
+    while True:
+        try:
+            listener = mpc.Listener(('localhost', port), authkey=auth)
+            break
+        except socket.error, e:
+            if e.errno in (errno.EADDRINUSE, errno.EACCES):
+                port += 1
+                continue
+            raise
+    child = Process(target=_tcp_child, args=(port, auth))
+    child.start()
+    con = listener.accept()
+    listener.close()
+    return child, con
+#end def
+
+def connect_socketpair(auth):
+    parent_sock, child_sock = socket.socketpair()
+    child = Process(target=_pair_child, args=(child_sock, auth))
+    child.start()
+    child_sock.close()
+    con = Connection(os.dup(parent_sock.fileno()))
+    parent_sock.close()
+    mpc.deliver_challenge(con, auth)
+    mpc.answer_challenge(con, auth)
+    return child, con
+#end def
+
+
+def measure(connect, n, payload):
+    auth = binascii.b2a_hex(os.urandom(32))
+    t0 = time()
+    child, con = connect(auth)
+    setup = time()-t0
+    t0 = time()
+    for _i in xrange(n):
+        con.send(payload)
+        con.recv()
+    rtt = (time()-t0)/n
+    con.send(None); con.recv()
+    child.join()
+    con.close()
+    return setup, rtt
+#end def
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    payloads = (('small', ('progress', {'stage': 'Analysis', 'fraction': 0.5})),
+                ('64KB',  'x'*(1<<16)))
+    print '%d round trips per measurement' % n
+    print '%-12s %-6s %12s %14s' % ('transport', 'msg', 'setup, ms', 'round trip, us')
+    for name, connect in (('socketpair', connect_socketpair),
+                          ('tcp',        connect_tcp)):
+        for pname, payload in payloads:
+            setup, rtt = measure(connect, n, payload)
+            print '%-12s %-6s %12.3f %14.2f' % (name, pname, setup*1e3, rtt*1e6)
@@ -0,0 +1,211 @@
+#!/usr/bin/python
+# coding=utf-8
+#
+# Copyright (C) 2013 Allis Tauri <allista@gmail.com>
+# 
+# DegenPrimerGUI is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# DegenPrimerGUI is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+End-to-end benchmark of the orchestration around the pipeline: 
+SubprocessWorker (the driver behind SubprocessThread) running 
+SubprocessBase jobs in benchmarks/stub_pipeline.py instead of DegenPrimer.
+
+Measured for both transports:
+    cold_start  spawn, auth handshake over stdin, one empty job, shutdown
+    first_job   spawn and the first job of a persistent worker
+    job_rtt     an empty job on a warm worker: job, ack and closing exchange
+    message     one progress message from the worker, amortized
+    options     throughput of job data sent to the worker, MB/s
+    results     throughput of results sent back, MB/s
+    abort       from stop() to the end of an aborted job
+
+Results are printed and written as JSON. With --compare the run fails
+if any time is slower (or throughput lower) than in the baseline 
+by more than the tolerance.
+
+Usage: python benchmarks/ipc_suite.py [-n repeats] [-o results.json] 
+                                      [--compare baseline.json] [--tolerance 0.25]
+'''
+
+import os
+import sys
+import json
+import socket
+import argparse
+import platform
+from threading import Timer
+from time import time, strftime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from DegenPrimerGUI.SubprocessWorker import SubprocessWorker
+import stub_pipeline
+
+
+class BenchWorker(SubprocessWorker):
+    '''Keeps the last results and drops the output of the stub'''
+    results = None
+    def _output(self, text): pass
+    def _results(self, data): self.results = data
+#end class
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values)//2]
+
+def timed(func, *args):
+    t0 = time()
+    func(*args)
+    return time()-t0
+#end def
+
+def run(worker, data):
+    if not worker.run_job(data): raise RuntimeError('stub job failed: %s' % data)
+
+
+def cold_start(transport, n):
+    def once():
+        worker = BenchWorker(stub_pipeline, False, transport)
+        run(worker, {'mode': 'noop'})
+    return median([timed(once) for _i in xrange(n)])
+#end def
+
+def first_job(transport, n):
+    def once():
+        worker = BenchWorker(stub_pipeline, True, transport)
+        t = timed(run, worker, {'mode': 'noop'})
+        worker.shutdown()
+        return t
+    return median([once() for _i in xrange(n)])
+#end def
+
+def job_rtt(worker, n):
+    return median([timed(run, worker, {'mode': 'noop'}) for _i in xrange(n)])
+
+def message(worker, count):
+    empty = timed(run, worker, {'mode': 'noop'})
+    full  = timed(run, worker, {'mode': 'messages', 'count': count})
+    return max(full-empty, 0)/count
+#end def
+
+def options_throughput(worker, size, n):
+    data = {'mode': 'noop', 'options': 'x'*size}
+    t = median([timed(run, worker, data) for _i in xrange(n)])
+    return size/t/(1<<20)
+#end def
+
+def results_throughput(worker, size, n):
+    data = {'mode': 'payload', 'size': size}
+    t = median([timed(run, worker, data) for _i in xrange(n)])
+    if len(worker.results) != size: raise RuntimeError('results were truncated')
+    return size/t/(1<<20)
+#end def
+
+def abort(worker, n, delay=0.05):
+    latencies = []
+    for _i in xrange(n):
+        stopped = []
+        def stop():
+            stopped.append(time())
+            worker._abort_subprocess() #stop() without the message
+        timer = Timer(delay, stop)
+        timer.start()
+        run(worker, {'mode': 'wait_abort', 'timeout': 10})
+        latencies.append(time()-stopped[0])
+        timer.join()
+    return median(latencies)
+#end def
+
+
+def benchmark(transport, n, size):
+    res = dict()
+    res['cold_start'] = cold_start(transport, n)
+    res['first_job']  = first_job(transport, n)
+    worker = BenchWorker(stub_pipeline, True, transport)
+    run(worker, {'mode': 'noop'}) #warm up
+    res['job_rtt']    = job_rtt(worker, n*10)
+    res['message']    = message(worker, n*100)
+    res['options']    = options_throughput(worker, size, n)
+    res['results']    = results_throughput(worker, size, n)
+    res['abort']      = abort(worker, n)
+    worker.shutdown()
+    return res
+#end def
+
+#metrics where more is better; the rest are times
+THROUGHPUT = ('options', 'results')
+UNITS = {'options': 'MB/s', 'results': 'MB/s'}
+
+def print_results(results):
+    metrics = sorted(results.values()[0].keys())
+    print '%-12s' % 'metric' + ''.join('%16s' % t for t in sorted(results))
+    for metric in metrics:
+        line = '%-12s' % metric
+        for transport in sorted(results):
+            value = results[transport][metric]
+            if metric in THROUGHPUT: line += '%11.1f MB/s' % value
+            else: line += '%13.3f ms' % (value*1e3)
+        print line
+#end def
+
+def compare(results, baseline, tolerance):
+    '''List metrics that regressed more than tolerance'''
+    regressions = []
+    for transport, metrics in results.iteritems():
+        for metric, value in metrics.iteritems():
+            base = baseline.get(transport, {}).get(metric)
+            if not base: continue
+            if metric in THROUGHPUT: change = base/value-1 if value else float('inf')
+            else: change = value/base-1
+            if change > tolerance:
+                regressions.append((transport, metric, base, value, change))
+    return regressions
+#end def
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser('End-to-end IPC benchmark with a stub pipeline')
+    parser.add_argument('-n', '--repeats', type=int, default=5,
+                        help='Repeats per measurement; medians are reported.')
+    parser.add_argument('-s', '--size', type=int, default=16<<20,
+                        help='Payload size in bytes for throughput.')
+    parser.add_argument('-o', '--output', default='ipc_suite-%s.json' % strftime('%Y%m%d-%H%M%S'),
+                        help='JSON file to write the results to.')
+    parser.add_argument('--compare', metavar='baseline.json',
+                        help='Fail if the results are worse than these.')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed relative regression (default: 0.25).')
+    args = parser.parse_args()
+    results = dict()
+    for transport in (SubprocessWorker.SOCKETPAIR, SubprocessWorker.TCP):
+        results[transport] = benchmark(transport, args.repeats, args.size)
+    print_results(results)
+    report = {'time':     strftime('%Y-%m-%dT%H:%M:%S'),
+              'host':     socket.gethostname(),
+              'platform': platform.platform(),
+              'python':   platform.python_version(),
+              'repeats':  args.repeats,
+              'size':     args.size,
+              'units':    dict((m, UNITS.get(m, 's')) for m in results.values()[0]),
+              'results':  results}
+    with open(args.output, 'w') as out:
+        json.dump(report, out, indent=2, sort_keys=True)
+    print '\nResults are written to %s' % args.output
+    if args.compare:
+        with open(args.compare) as inp: baseline = json.load(inp)['results']
+        regressions = compare(results, baseline, args.tolerance)
+        for transport, metric, base, value, change in regressions:
+            print 'REGRESSION %s %s: %g -> %g (%+.0f%%)' % (transport, metric, base, value, change*100)
+        if regressions: sys.exit(1)
@@ -0,0 +1,70 @@
+#!/usr/bin/python
+# coding=utf-8
+#
+# Copyright (C) 2013 Allis Tauri <allista@gmail.com>
+# 
+# DegenPrimerGUI is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# DegenPrimerGUI is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Cost of the LineIndex used to view large reports: time to build the
+index, its size and the time to read a screenful of lines at random
+positions, which should not depend on the size of the file.
+
+Usage: python benchmarks/line_index_bench.py [size_in_MB ...]
+'''
+
+import os
+import sys
+import random
+import tempfile
+from time import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from DegenPrimerGUI.LineIndex import LineIndex
+
+
+def make_report(filename, size):
+    line = 'primer\t%08d\tATGCATGCNNRYATGCATGC\t%5.1f\t%s\n'
+    with open(filename, 'wb') as out:
+        written = 0; i = 0
+        while written < size:
+            data = line % (i, 50+i%30, 'x'*(i%70))
+            out.write(data)
+            written += len(data); i += 1
+#end def
+
+
+def bench(size_mb, pages=1000, page=60):
+    filename = tempfile.mktemp(suffix='.txt')
+    make_report(filename, size_mb<<20)
+    try:
+        time0 = time()
+        index = LineIndex(filename)
+        index.build()
+        build = time()-time0
+        time0 = time()
+        for _i in xrange(pages):
+            index.lines(random.randint(0, max(0, len(index)-page)), page)
+        read = (time()-time0)/pages
+        print '%6d MB %10d lines: index %6.2f s, %8.1f KB, page of %d lines %6.3f ms' \
+        % (size_mb, len(index), build, index._offsets.itemsize*len(index._offsets)/1024.0,
+           page, read*1000)
+        index.close()
+    finally: os.remove(filename)
+#end def
+
+
+if __name__ == '__main__':
+    sizes = [int(a) for a in sys.argv[1:]] or [1, 16, 256]
+    for size in sizes: bench(size)
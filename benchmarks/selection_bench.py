@@ -0,0 +1,110 @@
+#!/usr/bin/python
+# coding=utf-8
+#
+# Copyright (C) 2013 Allis Tauri <allista@gmail.com>
+# 
+# DegenPrimerGUI is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# DegenPrimerGUI is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Cost of selection changes in the sequence selector with many selected
+records: the former list of selected rows, toggled with list.index and
+sent as a full joined ID list on every click, versus a click handled by
+SequenceTableView with its RowSelection, with all the rows fetched
+and the selection shown, and the changes then sent to the line edit.
+Whole-selection operations are timed for RowSelection only.
+
+Needs PyQt4.
+
+Usage: python benchmarks/selection_bench.py [number_of_records ...]
+'''
+
+import os
+import sys
+import random
+from time import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from PyQt4.QtGui import QApplication
+from DegenPrimerGUI.SequenceIndex import SequenceIndex, RowSelection
+from DegenPrimerGUI.Widgets import SequenceTableView, SequenceTableModel, PolyLineEdit
+
+
+#a click as it was handled before RowSelection
+def old_toggle(selected, ids, row):
+    try: del selected[selected.index(row)]
+    except ValueError: selected.append(row)
+    #send_ids -> PolyLineEdit.setText -> set_ids
+    text = u', '.join(unicode(ids[r]) for r in selected)
+    return [sid.rstrip(', ') for sid in text.split(', ')]
+#end def
+
+def make_view(ids, selected):
+    '''A view of all the records, all fetched, with the rows selected,
+    and the line edit it sends the changes of the selection to'''
+    view  = SequenceTableView()
+    index = SequenceIndex(ids)
+    #what the loader does when the first records arrive
+    view._seq_index = index
+    view._selection = RowSelection(len(index))
+    model = SequenceTableModel(index)
+    view.setModel(model)
+    model.rowsInserted.connect(view._select_fetched)
+    model.rows_to_load = len(index)
+    model.fetchMore()
+    view._selection.set_rows(selected)
+    view._show_selection()
+    edit = PolyLineEdit(None)
+    edit.setText([ids[row] for row in selected])
+    view.send_changes.connect(edit.change_items)
+    #the text is parsed by the first change
+    edit.change_items([], [])
+    return view, model, edit
+#end def
+
+
+def timeit(func, repeats=1):
+    time0 = time()
+    for _i in xrange(repeats): func()
+    return (time()-time0)/repeats
+#end def
+
+
+def bench(size, clicks=20):
+    ids  = ['seq%07d' % i for i in xrange(size)]
+    half = range(0, size, 2)
+    rows = [random.randrange(size) for _i in xrange(clicks)]
+    old_selected = list(half)
+    view, model, _edit = make_view(ids, half)
+    selection    = view._selection
+    old = timeit(lambda: [old_toggle(old_selected, ids, r) for r in rows])/clicks
+    new = timeit(lambda: [view._toggle_selection(model.index(r, 0)) for r in rows])/clicks
+    print '%d records, all fetched, %d selected' % (size, len(half))
+    print '  %-16s old %12.3f ms  new %10.3f ms  x%.0f' % ('click', old*1e3, new*1e3, old/new)
+    #the changes are sent once the clicks stop
+    print '  %-16s %33.3f ms' % ('send changes', timeit(view._send_ids)*1e3)
+    for name, func in (('select all', lambda: selection.add_range(0, size)),
+                       ('invert', lambda: selection.invert()),
+                       ('invert 1/3', lambda: selection.invert(range(0, size, 3))),
+                       ('range 1/2', lambda: selection.add_range(size//4, size*3//4)),
+                       ('selected IDs', lambda: selection.select(ids)),
+                       ('visible runs', lambda: RowSelection.runs(selection.flags(xrange(0, size)))),
+                       ('clear', lambda: selection.clear())):
+        print '  %-16s %33.3f ms' % (name, timeit(func)*1e3)
+#end def
+
+
+if __name__ == '__main__':
+    app   = QApplication(sys.argv)
+    sizes = [int(a) for a in sys.argv[1:]] or [10**3, 10**5, 10**6]
+    for size in sizes: bench(size)
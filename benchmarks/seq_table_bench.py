@@ -0,0 +1,104 @@
+#!/usr/bin/python
+# coding=utf-8
+#
+# Copyright (C) 2013 Allis Tauri <allista@gmail.com>
+# 
+# DegenPrimerGUI is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# DegenPrimerGUI is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Cost of row and ID lookups in SequenceTableModel: the key list and 
+ID index built once per model versus the former lookups that called 
+db.keys() every time (sid, sindex, sindexes).
+The database is an in-memory stand-in for SeqView whose keys() builds
+a new list on each call, as SeqView does.
+
+Needs PyQt4 and BioUtils.
+
+Usage: python benchmarks/seq_table_bench.py [number_of_records ...]
+'''
+
+import os
+import sys
+import random
+from time import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from Bio.Seq import Seq
+from Bio.SeqRecord import SeqRecord
+from DegenPrimerGUI.Widgets import SequenceTableModel
+from DegenPrimerGUI.SequenceIndex import SequenceIndex
+
+
+class MemoryDB(object):
+    def __init__(self, size):
+        self._ids = ['seq%07d' % i for i in xrange(size)]
+    
+    def __len__(self): return len(self._ids)
+    
+    def keys(self): return list(self._ids)
+    
+    def __getitem__(self, sid):
+        return SeqRecord(Seq('ATGC'), id=sid, description='%s test record' % sid)
+#end class
+
+
+#the lookups as they were before the model kept its own index
+def old_sid(db, row): return db.keys()[row]
+
+def old_sindex(db, sid):
+    try: return db.keys().index(sid)
+    except ValueError: return -1
+
+def old_sindexes(db, sids):
+    found = []
+    for i, k in enumerate(db.keys()):
+        if len(found) >= len(sids): break
+        if k in sids: found.append(i)
+    return found
+#end def
+
+
+def timeit(func, repeats):
+    time0 = time()
+    for _i in xrange(repeats): func()
+    return (time()-time0)/repeats
+#end def
+
+
+def bench(size, lookups=100, selected=1000):
+    db    = MemoryDB(size)
+    ids   = db.keys()
+    time0 = time()
+    model = SequenceTableModel(SequenceIndex(ids))
+    build = time()-time0
+    rows  = [random.randrange(size) for _i in xrange(lookups)]
+    sids  = [ids[row] for row in rows]
+    chosen = random.sample(ids, min(selected, size))
+    old_repeats = 1 if size > 10**5 else 10
+    results = [('sid', timeit(lambda: [old_sid(db, r) for r in rows], old_repeats)/lookups,
+                       timeit(lambda: [model.sid(r) for r in rows], 10)/lookups),
+               ('sindex', timeit(lambda: [old_sindex(db, s) for s in sids], old_repeats)/lookups,
+                          timeit(lambda: [model.sindex(s) for s in sids], 10)/lookups),
+               ('sindexes(%d)' % len(chosen), 
+                timeit(lambda: old_sindexes(db, chosen), old_repeats),
+                timeit(lambda: model.sindexes(chosen), 10))]
+    print '%d records, model built in %.3f s' % (size, build)
+    for name, old, new in results:
+        print '  %-16s old %12.3f us  new %10.3f us  x%.0f' % (name, old*1e6, new*1e6, old/new)
+#end def
+
+
+if __name__ == '__main__':
+    sizes = [int(a) for a in sys.argv[1:]] or [10**3, 10**5, 10**6]
+    for size in sizes: bench(size)
@@ -0,0 +1,65 @@
+#!/usr/bin/python
+# coding=utf-8
+#
+# Copyright (C) 2013 Allis Tauri <allista@gmail.com>
+# 
+# DegenPrimerGUI is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# DegenPrimerGUI is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Stand-in for degen_primer_pipeline used by ipc_suite.py: the same 
+SubprocessBase server with a configurable _do_work instead of DegenPrimer.
+
+The job data is a dict with the 'mode' key:
+    noop       return at once
+    payload    pass back a string of 'size' bytes as results
+    messages   send 'count' progress messages, then return
+    wait_abort wait up to 'timeout' seconds for the abort signal
+    fail       return 1, a failed job
+Any other keys (e.g. a large 'options' value) are only unpickled.
+'''
+
+import os
+import sys
+from time import time, sleep
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 
+                                '..', 'DegenPrimerGUI'))
+import SubprocessBase
+import Messages
+
+
+class StubSubprocess(SubprocessBase.SubprocessBase):
+    '''Subprocess with a configurable stub workload'''
+    
+    def _initialize(self): return True
+    
+    def _do_work(self, data):
+        mode = data.get('mode', 'noop')
+        if mode == 'payload':
+            self._send(Messages.results('x'*data['size']))
+        elif mode == 'messages':
+            for i in xrange(data['count']):
+                self._send(Messages.progress('Stub', float(i)/data['count']))
+        elif mode == 'wait_abort':
+            end = time()+data.get('timeout', 10)
+            while not self._abort_event.is_set() and time() < end: 
+                sleep(0.0005)
+        elif mode == 'fail': return 1
+        return 0
+    #end def
+#end class
+
+
+if __name__ == '__main__':
+    StubSubprocess()
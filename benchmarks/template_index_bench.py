@@ -0,0 +1,112 @@
+#!/usr/bin/python
+# coding=utf-8
+#
+# Copyright (C) 2013 Allis Tauri <allista@gmail.com>
+# 
+# DegenPrimerGUI is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# DegenPrimerGUI is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Indexing of several template files: serial SeqView.load of all files
+with the descriptions formatted afterwards, as the sequence selector
+does for a single file, versus index_file run by a pool of 1, 2, 4 ...
+worker processes, as it does for several uncached files.
+FASTA files with random records are generated in a temporary directory
+unless existing files are given.
+
+Needs BioUtils and Biopython.
+
+Usage: python benchmarks/template_index_bench.py [-n files] [-r records] [file ...]
+'''
+
+import os
+import sys
+import random
+import shutil
+import tempfile
+from time import time
+from multiprocessing import cpu_count
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from BioUtils.SeqUtils import SeqView, pretty_rec_name
+from DegenPrimerGUI.SequenceIndex import index_file, index_pool
+
+
+def generate(directory, files, records, length=500):
+    filenames = []
+    for f in xrange(files):
+        filename = os.path.join(directory, 'templates%02d.fa' % f)
+        with open(filename, 'w') as out:
+            for r in xrange(records):
+                out.write('>f%02d_seq%07d random template %d of file %d\n' % (f, r, r, f))
+                out.write(''.join(random.choice('ATGC') for _i in xrange(length))+'\n')
+        filenames.append(filename)
+    return filenames
+#end def
+
+
+def serial(filenames):
+    view = SeqView()
+    view.load(filenames)
+    ids  = view.keys()
+    descriptions = [pretty_rec_name(view[sid]) for sid in ids]
+    view.close()
+    return len(descriptions)
+#end def
+
+
+def parallel(filenames, workers):
+    pool  = index_pool(workers)
+    total = 0
+    for ids, _descriptions, error in pool.imap(index_file, filenames):
+        if error is not None: raise RuntimeError(error)
+        total += len(ids)
+    pool.close()
+    pool.join()
+    return total
+#end def
+
+
+def main(args):
+    files = 8; records = 20000; filenames = []
+    while args:
+        arg = args.pop(0)
+        if arg == '-n': files = int(args.pop(0))
+        elif arg == '-r': records = int(args.pop(0))
+        else: filenames.append(arg)
+    tmp = None
+    if not filenames:
+        tmp = tempfile.mkdtemp(prefix='template_index_bench')
+        print 'Generating %d files with %d records each...' % (files, records)
+        filenames = generate(tmp, files, records)
+    try:
+        time0 = time()
+        total = serial(filenames)
+        base  = time()-time0
+        print '%d files, %d records' % (len(filenames), total)
+        print '  %-12s %8.2f s' % ('serial', base)
+        workers = 1
+        while True:
+            time0 = time()
+            parallel(filenames, workers)
+            elapsed = time()-time0
+            print '  %-12s %8.2f s  x%.2f' % ('%d workers' % workers, elapsed, base/elapsed)
+            if workers >= min(cpu_count(), len(filenames)): break
+            workers = min(workers*2, cpu_count(), len(filenames))
+    finally:
+        if tmp is not None: shutil.rmtree(tmp)
+#end def
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,77 @@
+#!/usr/bin/python
+# coding=utf-8
+#
+# Copyright (C) 2013 Allis Tauri <allista@gmail.com>
+# 
+# DegenPrimerGUI is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# DegenPrimerGUI is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Cost of building the GUI forms: uic.loadUi, which parses the .ui file 
+every time, versus a form class compiled once (UiForms) and reused.
+Measures the first build (main window start-up) and the following ones
+(a new report tab each time).
+
+Needs PyQt4 and a display (e.g. run under xvfb-run).
+
+Usage: python benchmarks/ui_forms_bench.py [number_of_tabs]
+'''
+
+import os
+import sys
+from time import time
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, root)
+from PyQt4 import uic
+from PyQt4.QtGui import QApplication, QMainWindow, QFrame
+from DegenPrimerGUI import UiForms
+
+resources = os.path.join(root, 'resources')
+
+
+def load_ui(ui_file, widget_class):
+    widget = widget_class()
+    uic.loadUi(os.path.join(resources, ui_file), widget)
+    return widget
+#end def
+
+def cached_form(ui_file, widget_class):
+    widget = widget_class()
+    UiForms.setup_ui(ui_file, widget, [resources])
+    return widget
+#end def
+
+def measure(build, ui_file, widget_class, n):
+    UiForms._forms.clear()
+    t0 = time()
+    build(ui_file, widget_class).deleteLater()
+    first = time()-t0
+    t0 = time()
+    for _i in xrange(n): build(ui_file, widget_class).deleteLater()
+    return first, (time()-t0)/n
+#end def
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    app = QApplication(sys.argv)
+    precompiled = all(UiForms._precompiled(ui) for ui in ('DegenPrimerUI.ui', 'ReportWidget.ui'))
+    print 'Precompiled forms: %s' % ('found' if precompiled else 'not found, compiled at runtime')
+    print '%-18s %-12s %12s %12s' % ('form', 'method', 'first, ms', 'next, ms')
+    for ui_file, widget_class in (('DegenPrimerUI.ui', QMainWindow),
+                                  ('ReportWidget.ui', QFrame)):
+        for name, build in (('uic.loadUi', load_ui), ('cached form', cached_form)):
+            first, rest = measure(build, ui_file, widget_class, n)
+            print '%-18s %-12s %12.2f %12.2f' % (ui_file, name, first*1e3, rest*1e3)
+    app.processEvents()
@@ -49,6 +49,14 @@ rcc_file = open(rcc_filename, 'w')
 rcc_file.write(rcc_filtered)
 rcc_file.close()
 
+#compile forms, so that .ui files are not parsed at runtime
+ui_files = ['DegenPrimerUI.ui', 'ReportWidget.ui']
+for ui_file in ui_files:
+    ui_module = 'DegenPrimerGUI/%s_ui.py' % os.path.splitext(ui_file)[0]
+    pyuic4_cli = 'pyuic4 -o %s resources/%s' % (ui_module, ui_file)
+    if subprocess.call(pyuic4_cli, shell=(sys.platform!="win32")) != 0:
+        print 'Unable to compile %s; it will be compiled at runtime.' % ui_file
+
 #setup
 from distutils.core import setup
 setup(name='degen-primer-gui',
@@ -66,7 +74,7 @@ setup(name='degen-primer-gui',
         'Operating System :: POSIX',
         'Programming Language :: Python'],
       packages=['DegenPrimerGUI'],
-      scripts=['degen_primer_gui'],
+      scripts=['degen_primer_gui', 'degen_primer_batch'],
       data_files=[('share/icons/hicolor/scalable/apps', ['resources/degen_primer.svg', 'resources/clear.svg']),
                   ('share/applications', ['DegenPrimerGUI.desktop']),
                   ('share/degen_primer_gui', ['resources/DegenPrimerUI.ui', 'resources/DegenPrimerUI.qrc', 'resources/ReportWidget.ui'])]